@@ -0,0 +1,107 @@
+import json
+import time
+
+DEFAULT_BATCH_FILE = "batch_requests.jsonl"
+POLL_INITIAL_DELAY = 10
+POLL_MAX_DELAY = 300
+POLL_BACKOFF = 1.5
+
+FINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+SUCCESS_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+
+
+def write_batch_requests(path: str, prompts: list[tuple[str, str]], config: dict):
+    """
+    Escreve um pedido por linha no formato JSONL da Batch API, usando o
+    nome do arquivo analisado como chave.
+    """
+    config = dict(config)
+    system_instruction = config.pop("system_instruction", None)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for key, prompt in prompts:
+            line = {
+                "key": key,
+                "request": {
+                    "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                    "generation_config": config
+                }
+            }
+            if system_instruction:
+                line["request"]["system_instruction"] = {"parts": [{"text": system_instruction}]}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def submit_batch(client, model: str, path: str):
+    uploaded = client.files.upload(
+        file=path,
+        config={"display_name": path, "mime_type": "jsonl"}
+    )
+    return client.batches.create(
+        model=model,
+        src=uploaded.name,
+        config={"display_name": f"sast-ai-{int(time.time())}"}
+    )
+
+
+def wait_for_batch(client, name: str):
+    delay = POLL_INITIAL_DELAY
+
+    while True:
+        job = client.batches.get(name=name)
+        state = getattr(job.state, "name", str(job.state))
+        print(f"   ⏳ Batch {name}: {state}")
+
+        if state in FINAL_STATES:
+            return job, state
+
+        time.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+
+def response_text(response: dict) -> str:
+    parts = []
+    for candidate in (response.get("candidates") or [])[:1]:
+        for part in (candidate.get("content") or {}).get("parts") or []:
+            if part.get("text"):
+                parts.append(part["text"])
+    return "".join(parts)
+
+
+def iter_batch_results(client, job, download_path: str):
+    """
+    Gera (chave, texto, erro) para cada linha do resultado do batch, lendo o
+    arquivo de saída linha a linha em vez de carregá-lo inteiro.
+    """
+    dest = job.dest
+
+    if dest is not None and dest.inlined_responses:
+        for index, inlined in enumerate(dest.inlined_responses):
+            key = (inlined.metadata or {}).get("key", str(index))
+            if inlined.error is not None:
+                yield key, None, str(inlined.error)
+            else:
+                yield key, inlined.response.text or "", None
+        return
+
+    if dest is None or not dest.file_name:
+        return
+
+    client.files.download(file=dest.file_name, destination=download_path)
+
+    with open(download_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = item.get("key")
+            if "error" in item:
+                yield key, None, json.dumps(item["error"], ensure_ascii=False)
+            else:
+                yield key, response_text(item.get("response") or {}), None
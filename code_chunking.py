@@ -0,0 +1,90 @@
+import ast
+import bisect
+
+from rate_limiter import CHARS_PER_TOKEN
+from response_parsing import LINE_KEY
+
+# Arquivos acima disso (tokens estimados) são divididos em janelas
+DEFAULT_CHUNK_TOKENS = 6000
+
+# Linhas repetidas entre janelas vizinhas, para uma vulnerabilidade que
+# cruza a fronteira aparecer inteira em pelo menos uma delas
+OVERLAP_LINES = 20
+
+
+def _boundaries(code: str) -> list[int]:
+    # Linhas onde um comando de topo ou uma def/class (com decoradores) começa
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+
+    starts = {node.lineno for node in tree.body}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            starts.add(min([node.lineno] + [d.lineno for d in node.decorator_list]))
+    return sorted(starts)
+
+
+def chunk_code(code: str, max_tokens=DEFAULT_CHUNK_TOKENS, overlap=OVERLAP_LINES):
+    """
+    Divide o código em janelas de até `max_tokens` tokens estimados, cortando
+    de preferência no início de uma função, classe ou comando de topo, com
+    ~`overlap` linhas em comum entre janelas vizinhas. Devolve uma lista de
+    (deslocamento, trecho): a linha n do trecho é a linha n + deslocamento
+    do arquivo. Código pequeno volta numa janela só.
+    """
+    lines = code.splitlines(keepends=True)
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(code) <= budget or len(lines) < 2:
+        return [(0, code)]
+
+    # ends[i] = caracteres das linhas 1..i
+    ends = [0]
+    for line in lines:
+        ends.append(ends[-1] + len(line))
+
+    boundaries = _boundaries(code)
+    windows = []
+    start = 1
+
+    while True:
+        # Maior fim de janela (última linha inclusa) que cabe no orçamento
+        last = bisect.bisect_right(ends, ends[start - 1] + budget) - 1
+        last = max(last, start)
+        if last >= len(lines):
+            windows.append((start - 1, "".join(lines[start - 1:])))
+            break
+
+        # Recua até a linha antes de uma fronteira, se houver uma na janela
+        cut = bisect.bisect_right(boundaries, last + 1) - 1
+        if cut >= 0 and boundaries[cut] - 1 > start:
+            last = boundaries[cut] - 1
+
+        windows.append((start - 1, "".join(lines[start - 1:last])))
+
+        # A próxima janela começa numa fronteira dentro da sobreposição
+        next_start = last + 1 - overlap
+        i = bisect.bisect_left(boundaries, next_start)
+        if i < len(boundaries) and boundaries[i] <= last:
+            next_start = boundaries[i]
+        start = max(next_start, start + 1)
+
+    return windows
+
+
+def merge_chunks(parts: list[tuple[int, list]]) -> list:
+    """
+    Junta as predições das janelas, corrigindo as linhas pelo deslocamento de
+    cada uma e descartando as repetidas nas regiões sobrepostas.
+    """
+    merged = []
+    seen = set()
+    for offset, predictions in parts:
+        for item in predictions:
+            item = dict(item, **{LINE_KEY: item[LINE_KEY] + offset})
+            key = (item["label"], item[LINE_KEY])
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
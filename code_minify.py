@@ -0,0 +1,111 @@
+import ast
+import io
+import tokenize
+
+from response_parsing import LINE_KEY
+
+# Strings maiores que isso são encurtadas; o começo costuma bastar para o
+# modelo reconhecer o que ela é (SQL, comando, caminho...).
+MAX_STRING_CHARS = 200
+KEEP_STRING_CHARS = 80
+
+DOCSTRING_OWNERS = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _docstrings(tree) -> dict:
+    """
+    Posição (linha, coluna) de cada docstring -> texto que a substitui: nada,
+    ou `...` quando a docstring é o único comando do corpo.
+    """
+    found = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, DOCSTRING_OWNERS) or not node.body:
+            continue
+        first = node.body[0]
+        if (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+                and isinstance(first.value.value, str)):
+            alone = len(node.body) == 1 and not isinstance(node, ast.Module)
+            found[(first.lineno, first.col_offset)] = "..." if alone else ""
+    return found
+
+
+def _shorten(text: str):
+    if len(text) <= MAX_STRING_CHARS or "f" in text.split(text[-1])[0].lower():
+        return None
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+    suffix = b"..." if isinstance(value, bytes) else "..."
+    return repr(value[:KEEP_STRING_CHARS] + suffix)
+
+
+def _apply(lines: list[str], edits: list) -> list:
+    # Cada edição troca um trecho (que pode cruzar linhas) por um texto de uma
+    # linha só; a linha resultante herda o número da linha onde o trecho começa.
+    result = []
+    buf, buf_row = "", 1
+    row, col = 1, 0
+
+    for (start_row, start_col), (end_row, end_col), text in edits:
+        while row < start_row:
+            result.append((buf_row, buf + lines[row - 1][col:]))
+            row, col = row + 1, 0
+            buf, buf_row = "", row
+        buf += lines[row - 1][col:start_col] + text
+        row, col = end_row, end_col
+
+    while row <= len(lines):
+        result.append((buf_row, buf + lines[row - 1][col:]))
+        row, col = row + 1, 0
+        buf, buf_row = "", row
+
+    return result
+
+
+def minify(code: str):
+    """
+    Remove comentários, docstrings e linhas em branco e encurta strings
+    longas. Devolve (código reduzido, mapa de linhas), onde mapa[i] é a linha
+    original da linha i + 1 do código reduzido. Código que não compila é
+    devolvido como está.
+    """
+    lines = code.splitlines(keepends=True)
+    identity = list(range(1, len(lines) + 1))
+
+    try:
+        docstrings = _docstrings(ast.parse(code))
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (SyntaxError, tokenize.TokenError, ValueError):
+        return code, identity
+
+    edits = []
+    for token in tokens:
+        if token.type == tokenize.COMMENT:
+            edits.append((token.start, token.end, ""))
+        elif token.type == tokenize.STRING:
+            if token.start in docstrings:
+                edits.append((token.start, token.end, docstrings[token.start]))
+            else:
+                short = _shorten(token.string)
+                if short is not None:
+                    edits.append((token.start, token.end, short))
+
+    kept = []
+    line_map = []
+    for row, text in _apply(lines, edits):
+        text = text.rstrip()
+        if text.strip():
+            kept.append(text)
+            line_map.append(row)
+
+    return "\n".join(kept), line_map
+
+
+def remap_lines(predictions: list, line_map: list[int]) -> list:
+    # Linhas fora do código reduzido (alucinações) ficam como vieram
+    return [
+        dict(item, **{LINE_KEY: line_map[item[LINE_KEY] - 1]})
+        if 1 <= item[LINE_KEY] <= len(line_map) else item
+        for item in predictions
+    ]
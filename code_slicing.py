@@ -0,0 +1,165 @@
+import ast
+
+# Fatia que sobra com mais que isso das linhas do arquivo não compensa:
+# os números de linha anotados custam mais do que as linhas removidas
+MAX_SLICE_RATIO = 0.8
+
+SLICE_HEADER = (
+    "# Only the parts of the file related to the flagged lines are shown; "
+    "each line starts with its original line number."
+)
+
+FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _start(node) -> int:
+    # Inclui os decoradores: em rotas Flask/Django é onde a entrada do usuário aparece
+    return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+
+def _names(node) -> set:
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr)
+    return names
+
+
+def _defined(node) -> set:
+    names = set()
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        for alias in node.names:
+            names.add((alias.asname or alias.name).split(".")[0])
+    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        names.add(node.name)
+    else:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                names.add(child.id)
+    return names
+
+
+def _covers(node, line: int) -> bool:
+    return _start(node) <= line <= node.end_lineno
+
+
+def slice_code(code: str, flagged: set):
+    """
+    Recorta do código só o que interessa às linhas apontadas pelo SAST: as
+    funções que contêm essas linhas, as que as chamam (subindo até a origem
+    do dado) e as que elas chamam (descendo até o sink), mais os imports e
+    comandos de topo que definem nomes usados por elas. Cada linha sai
+    anotada com o número original. Devolve None se o código não compila ou
+    se a fatia não ficaria bem menor que o arquivo.
+    """
+    if not flagged:
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    lines = code.splitlines()
+
+    # Funções do arquivo (de topo e métodos) e o que cada uma chama
+    functions = {}
+    owner = {}
+    for node in tree.body:
+        if isinstance(node, FUNCTION_TYPES):
+            functions.setdefault(node.name, []).append(node)
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, FUNCTION_TYPES):
+                    functions.setdefault(item.name, []).append(item)
+                    owner[id(item)] = node
+
+    calls = {}
+    for name, nodes in functions.items():
+        for node in nodes:
+            called = set()
+            for child in ast.walk(node):
+                if isinstance(child, ast.Call):
+                    func = child.func
+                    if isinstance(func, ast.Name):
+                        called.add(func.id)
+                    elif isinstance(func, ast.Attribute):
+                        called.add(func.attr)
+            calls[name] = calls.get(name, set()) | (called & functions.keys())
+
+    # Linha apontada num import ou atribuição de topo: o interesse está em
+    # quem usa o nome definido ali (ex: `import pickle` -> quem chama pickle)
+    flagged_names = set()
+    for node in tree.body:
+        if not isinstance(node, FUNCTION_TYPES + (ast.ClassDef,)) and any(
+                _covers(node, line) for line in flagged):
+            flagged_names |= _defined(node)
+
+    seeds = {name for name, nodes in functions.items()
+             if any(_covers(node, line) for node in nodes for line in flagged)
+             or any(_names(node) & flagged_names for node in nodes)}
+
+    # Sobe pelos chamadores e desce pelos chamados, sem misturar as direções
+    relevant = set(seeds)
+    for graph in (calls, {name: {caller for caller, called in calls.items() if name in called}
+                          for name in functions}):
+        stack = list(seeds)
+        while stack:
+            for nxt in graph.get(stack.pop(), ()):
+                if nxt not in relevant:
+                    relevant.add(nxt)
+                    stack.append(nxt)
+
+    selected = set()
+    used = set()
+
+    # Linha apontada no corpo de uma classe, fora dos métodos: vai a classe toda
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any(
+                _covers(node, line) and not any(_covers(item, line) for item in node.body
+                                                if isinstance(item, FUNCTION_TYPES))
+                for line in flagged):
+            selected.update(range(_start(node), node.end_lineno + 1))
+            used |= _names(node)
+
+    for name in relevant:
+        for node in functions[name]:
+            selected.update(range(_start(node), node.end_lineno + 1))
+            used |= _names(node)
+            cls = owner.get(id(node))
+            if cls is not None:
+                selected.update(range(_start(cls), cls.lineno + 1))
+                used |= _names(ast.Module(body=cls.bases + cls.decorator_list, type_ignores=[]))
+
+    # Comandos de topo: os que contêm linhas apontadas e os que definem nomes
+    # usados pelo que já entrou (até estabilizar, para pegar dependências
+    # como `app = Flask(__name__)` -> import do Flask)
+    top = [node for node in tree.body if not isinstance(node, FUNCTION_TYPES + (ast.ClassDef,))]
+    changed = True
+    while changed:
+        changed = False
+        for node in top:
+            if _start(node) in selected:
+                continue
+            if any(_covers(node, line) for line in flagged) or _defined(node) & used:
+                selected.update(range(_start(node), node.end_lineno + 1))
+                used |= _names(node)
+                changed = True
+
+    selected = sorted(n for n in selected if n <= len(lines) and lines[n - 1].strip()
+                      and not lines[n - 1].lstrip().startswith("#"))
+    if not selected or len(selected) > MAX_SLICE_RATIO * len(lines):
+        return None
+
+    width = len(str(selected[-1]))
+    out = [SLICE_HEADER]
+    previous = 0
+    for n in selected:
+        # Só marca o corte quando alguma linha com código ficou de fora
+        if previous and any(lines[k].strip() and not lines[k].lstrip().startswith("#")
+                            for k in range(previous, n - 1)):
+            out.append("...")
+        out.append(f"{n:>{width}}: {lines[n - 1]}")
+        previous = n
+    return "\n".join(out)
@@ -0,0 +1,38 @@
+import hashlib
+import os
+
+
+def normalized_hash(code: str) -> str:
+    """
+    Hash do conteúdo ignorando só o que não muda o que a IA vê em cada linha:
+    fim de linha (CRLF/LF), espaços no fim das linhas e linhas em branco no
+    final do arquivo. A numeração das linhas é preservada.
+    """
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def group_duplicates(files: list[str], labels_by_file: dict):
+    """
+    Agrupa arquivos com o mesmo conteúdo normalizado e os mesmos labels.
+    Devolve (representantes, duplicatas): um arquivo por grupo, na ordem
+    original, e {nome do representante: [nomes das cópias]}.
+    """
+    representatives = []
+    duplicates = {}
+    seen = {}
+
+    for file_path in files:
+        name = os.path.basename(file_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            key = (normalized_hash(f.read()), tuple(labels_by_file.get(name, [])))
+
+        if key in seen:
+            duplicates.setdefault(seen[key], []).append(name)
+        else:
+            seen[key] = name
+            representatives.append(file_path)
+
+    return representatives, duplicates
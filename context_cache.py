@@ -0,0 +1,55 @@
+import hashlib
+
+DEFAULT_TTL = 3600
+
+
+def cache_display_name(system_instruction: str) -> str:
+    # O hash das instruções entra no nome para que uma nova versão do
+    # prompt nunca reaproveite um cache com o texto antigo.
+    digest = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:12]
+    return f"sast-ai-instructions-{digest}"
+
+
+def get_or_create_context_cache(client, model: str, system_instruction: str, ttl=DEFAULT_TTL):
+    """
+    Reaproveita (ou cria) um CachedContent com as instruções fixas do prompt.
+    Devolve o nome do cache, ou None se a API recusar (ex: instruções abaixo
+    do mínimo de tokens para cache explícito); nesse caso o chamador envia
+    as instruções como system_instruction e conta com o cache implícito.
+    Se o cache expirar no meio da execução, o Requester volta sozinho para
+    o system_instruction.
+    """
+    from google.genai import types
+
+    display_name = cache_display_name(system_instruction)
+
+    try:
+        for cached in client.caches.list():
+            if cached.display_name == display_name and cached.model and cached.model.endswith(model):
+                # Renova o TTL: um cache reaproveitado pode estar a minutos de expirar
+                try:
+                    client.caches.update(
+                        name=cached.name,
+                        config=types.UpdateCachedContentConfig(ttl=f"{ttl}s")
+                    )
+                except Exception as e:
+                    print(f"⚠️ Não foi possível renovar o cache de contexto {cached.name} ({e})")
+                    continue
+                print(f"🧊 Reutilizando cache de contexto: {cached.name} (TTL renovado para {ttl}s)")
+                return cached.name
+
+        cached = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=display_name,
+                system_instruction=system_instruction,
+                ttl=f"{ttl}s"
+            )
+        )
+    except Exception as e:
+        print(f"⚠️ Não foi possível usar o cache de contexto ({e}); "
+              "enviando as instruções como system_instruction")
+        return None
+
+    print(f"🧊 Cache de contexto criado: {cached.name} (TTL {ttl}s)")
+    return cached.name
@@ -0,0 +1,31 @@
+import json
+import os
+
+
+def load_labels(path: str):
+    """
+    Lê o JSON de labels do SAST. Devolve ({arquivo: [cwe, ...]},
+    {arquivo: {linhas apontadas}}), com os arquivos pelo nome base.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        all_labels = json.load(f)
+
+    labels_by_file = {}
+    lines_by_file = {}
+    for item in all_labels:
+        fname = os.path.basename(item["filename"])
+        labels_by_file.setdefault(fname, []).append(item["cwe"])
+        if item.get("line") is not None:
+            lines_by_file.setdefault(fname, set()).add(item["line"])
+
+    return labels_by_file, lines_by_file
+
+
+def discover_files(source_code_dir: str, labels_by_file: dict) -> list[str]:
+    # Arquivos .py do diretório que têm algum label do SAST, na ordem do os.walk
+    files_to_process = []
+    for root, _, files in os.walk(source_code_dir):
+        for file in files:
+            if file.endswith(".py") and os.path.basename(file) in labels_by_file:
+                files_to_process.append(os.path.join(root, file))
+    return files_to_process
@@ -0,0 +1,559 @@
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Servidor local que imita a API do Gemini (v1beta) para medir o
+# gemini_requester.py sem chave de API:
+#
+#   python fake_gemini_server.py --port 8765 --latency-mean 1.5 --error-rate 0.02
+#   python gemini_requester.py ... --base-url http://127.0.0.1:8765
+#
+# Suporta generateContent, streamGenerateContent (SSE), countTokens,
+# cachedContents (com expiração e renovação do TTL) e o fluxo da Batch API (upload, batchGenerateContent,
+# consulta e download do resultado).
+
+CHARS_PER_TOKEN = 4
+
+FILE_RE = re.compile(r"File: (\S+)\n'''\n(.*?)\n'''\nList of vulnerabilities for \S+:\n([^\n]*)", re.DOTALL)
+CODE_RE = re.compile(r"Python code:\n'''\n(.*?)\n'''", re.DOTALL)
+LABELS_RE = re.compile(r"List of vulnerabilities:\n([^\n]*)")
+
+MALFORMED_ANSWERS = [
+    "Sure! Here are the vulnerabilities I found:",
+    "[{\"label\": \"CWE-",
+    "```json\n[{label: CWE-79, line of Code: 3}]\n```",
+]
+
+
+class FakeGemini:
+    """
+    Estado e comportamento do servidor falso: latência, erros, rajadas de
+    429, respostas malformadas, caches de contexto e jobs de batch.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.burst_until = 0.0
+        self.files = {}
+        self.uploads = {}
+        self.batches = {}
+        self.caches = {}
+        self.key_calls = {}
+        self.invalid_keys = {key for key in args.invalid_keys.split(",") if key}
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "malformed": 0}
+
+    # =============================
+    # Sorteios
+    # =============================
+    def latency(self) -> float:
+        if self.args.latency_mean <= 0:
+            return 0.0
+        with self.lock:
+            # Lognormal com a média pedida: cauda longa como a da API real
+            sigma = self.args.latency_sigma
+            mu = _lognormal_mu(self.args.latency_mean, sigma)
+            return self.random.lognormvariate(mu, sigma)
+
+    def fault(self, api_key=None):
+        """
+        Sorteia uma falha para a requisição: (status, corpo) ou None.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+
+            if api_key in self.invalid_keys:
+                self.stats["errors"] += 1
+                return 400, _error_body(400, "INVALID_ARGUMENT",
+                                        "API key not valid. Please pass a valid API key.",
+                                        reason="API_KEY_INVALID")
+
+            if self.args.rpm_per_key:
+                # Cota por chave numa janela deslizante de 60s, como a de um projeto
+                calls = [t for t in self.key_calls.get(api_key, []) if now - t < 60]
+                if len(calls) >= self.args.rpm_per_key:
+                    self.key_calls[api_key] = calls
+                    self.stats["rate_limited"] += 1
+                    delay = 60 - (now - calls[0])
+                    return 429, _error_body(429, "RESOURCE_EXHAUSTED", "Quota exceeded",
+                                            retry_delay=delay)
+                calls.append(now)
+                self.key_calls[api_key] = calls
+
+            if now < self.burst_until or self.random.random() < self.args.burst_rate:
+                if now >= self.burst_until:
+                    self.burst_until = now + self.args.burst_duration
+                self.stats["rate_limited"] += 1
+                delay = max(0.0, self.burst_until - now)
+                return 429, _error_body(429, "RESOURCE_EXHAUSTED", "Quota exceeded", retry_delay=delay)
+
+            if self.random.random() < self.args.error_rate:
+                self.stats["errors"] += 1
+                return 503, _error_body(503, "UNAVAILABLE", "The model is overloaded")
+
+        return None
+
+    def malformed(self) -> bool:
+        with self.lock:
+            if self.random.random() < self.args.malformed_rate:
+                self.stats["malformed"] += 1
+                return True
+            self.stats["ok"] += 1
+            return False
+
+    # =============================
+    # Geração das respostas
+    # =============================
+    def answer(self, prompt: str, seed: int) -> str:
+        """
+        Resposta determinística para o prompt: um achado por label, numa
+        linha sorteada a partir do hash do código.
+        """
+        packed = FILE_RE.findall(prompt)
+        if packed:
+            return json.dumps({
+                name: _predictions(code, labels, seed) for name, code, labels in packed
+            })
+
+        code = CODE_RE.search(prompt)
+        labels = LABELS_RE.search(prompt)
+        return json.dumps(_predictions(
+            code.group(1) if code else prompt,
+            labels.group(1) if labels else "",
+            seed
+        ))
+
+    def generate(self, body: dict) -> dict:
+        prompt = _request_text(body)
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        count = int(config.get("candidateCount") or config.get("candidate_count") or 1)
+        temperature = float(config.get("temperature") or 0.0)
+
+        candidates = []
+        for index in range(count):
+            if self.malformed():
+                text = self.random.choice(MALFORMED_ANSWERS)
+            else:
+                # Com temperatura > 0 cada candidato varia um pouco
+                seed = self.random.randrange(1 << 30) if temperature > 0 else 0
+                text = self.answer(prompt, seed)
+            candidates.append({
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": index
+            })
+
+        system = _text_of(body.get("systemInstruction") or body.get("system_instruction") or {})
+        cached = 0
+        cache_name = body.get("cachedContent")
+        if cache_name and cache_name in self.caches:
+            cached = self.caches[cache_name]["tokens"]
+
+        prompt_tokens = _tokens(prompt) + _tokens(system) + cached
+        candidate_tokens = sum(_tokens(_text_of(c["content"])) for c in candidates)
+        return {
+            "candidates": candidates,
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "cachedContentTokenCount": cached,
+                "candidatesTokenCount": candidate_tokens,
+                "totalTokenCount": prompt_tokens + candidate_tokens
+            },
+            "modelVersion": self.args.model_version
+        }
+
+    # =============================
+    # Cache de contexto
+    # =============================
+    def create_cache(self, body: dict) -> dict:
+        name = f"cachedContents/fake-{next(self.ids)}"
+        system = _text_of(body.get("systemInstruction") or {})
+        cache = {
+            "name": name,
+            "displayName": body.get("displayName", ""),
+            "model": body.get("model", ""),
+            "usageMetadata": {"totalTokenCount": _tokens(system)},
+            "tokens": _tokens(system)
+        }
+        self.set_ttl(cache, body.get("ttl", "3600s"))
+        self.caches[name] = cache
+        return cache
+
+    def set_ttl(self, cache: dict, ttl: str):
+        seconds = float(str(ttl).rstrip("s"))
+        if self.args.max_cache_ttl:
+            seconds = min(seconds, self.args.max_cache_ttl)
+        cache["expires"] = time.time() + seconds
+        cache["expireTime"] = _rfc3339(cache["expires"])
+
+    def live_cache(self, name: str):
+        # Como na API, um cache expirado some: nem aparece na lista nem serve
+        cache = self.caches.get(name)
+        if cache is not None and cache["expires"] <= time.time():
+            self.caches.pop(name, None)
+            cache = None
+        return cache
+
+    # =============================
+    # Batch API
+    # =============================
+    def create_batch(self, model: str, body: dict) -> dict:
+        batch = body.get("batch", body)
+        source = (batch.get("inputConfig") or {}).get("fileName")
+        name = f"batches/fake-{next(self.ids)}"
+        self.batches[name] = {
+            "name": name,
+            "model": model,
+            "displayName": batch.get("displayName", ""),
+            "source": source,
+            "ready_at": time.monotonic() + self.args.batch_delay,
+            "output": None
+        }
+        return self.batch_status(name)
+
+    def batch_status(self, name: str) -> dict:
+        batch = self.batches[name]
+
+        if time.monotonic() < batch["ready_at"]:
+            state = "BATCH_STATE_RUNNING"
+        else:
+            state = "BATCH_STATE_SUCCEEDED"
+            if batch["output"] is None:
+                batch["output"] = self.run_batch(batch["source"])
+
+        metadata = {
+            "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+            "model": batch["model"],
+            "displayName": batch["displayName"],
+            "state": state
+        }
+        if batch["output"]:
+            metadata["output"] = {"responsesFile": batch["output"]}
+        return {"name": name, "metadata": metadata}
+
+    def run_batch(self, source: str) -> str:
+        lines = []
+        for line in self.files.get(source, b"").decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            fault = self.fault()
+            if fault is not None:
+                lines.append({"key": item.get("key"), "error": fault[1]["error"]})
+            else:
+                lines.append({"key": item.get("key"), "response": self.generate(item["request"])})
+
+        name = f"files/fake-out-{next(self.ids)}"
+        self.files[name] = "".join(json.dumps(l) + "\n" for l in lines).encode("utf-8")
+        return name
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeGemini = None
+
+    def log_message(self, fmt, *args):
+        if self.fake.args.verbose:
+            super().log_message(fmt, *args)
+
+    def send_json(self, status: int, body: dict, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        fake = self.fake
+
+        if path == "/stats":
+            self.send_json(200, fake.stats)
+        elif path.startswith("/v1beta/batches/"):
+            name = path[len("/v1beta/"):]
+            if name not in fake.batches:
+                self.send_json(404, _error_body(404, "NOT_FOUND", f"{name} not found"))
+            else:
+                self.send_json(200, fake.batch_status(name))
+        elif path == "/v1beta/cachedContents":
+            caches = [fake.live_cache(name) for name in list(fake.caches)]
+            self.send_json(200, {"cachedContents": [
+                _public_cache(cache) for cache in caches if cache is not None
+            ]})
+        elif re.match(r"^(/download)?/v1beta/files/[^/]+:download$", path):
+            name = path[path.index("files/"):-len(":download")]
+            data = fake.files.get(name)
+            if data is None:
+                self.send_json(404, _error_body(404, "NOT_FOUND", f"{name} not found"))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_json(404, _error_body(404, "NOT_FOUND", f"Unknown path {path}"))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        path = url.path
+        raw = self.read_body()
+        fake = self.fake
+
+        if path == "/upload/v1beta/files":
+            self.handle_upload(url, raw)
+            return
+
+        body = json.loads(raw or b"{}")
+        match = re.match(r"^/v1beta/(models/[^:]+):(\w+)$", path)
+
+        if path == "/v1beta/cachedContents":
+            cache = fake.create_cache(body)
+            self.send_json(200, _public_cache(cache))
+        elif match and match.group(2) == "countTokens":
+            text = _request_text(body.get("generateContentRequest", body))
+            self.send_json(200, {"totalTokens": _tokens(text)})
+        elif match and match.group(2) == "batchGenerateContent":
+            self.send_json(200, fake.create_batch(match.group(1), body))
+        elif match and match.group(2) in ("generateContent", "streamGenerateContent"):
+            time.sleep(fake.latency())
+            fault = fake.fault(self.headers.get("x-goog-api-key"))
+            if fault is not None:
+                status, error = fault
+                headers = {}
+                if status == 429 and time.monotonic() < fake.burst_until:
+                    headers["Retry-After"] = str(max(1, int(fake.burst_until - time.monotonic() + 1)))
+                self.send_json(status, error, headers)
+            elif body.get("cachedContent") and fake.live_cache(body["cachedContent"]) is None:
+                self.send_json(403, _error_body(403, "PERMISSION_DENIED",
+                                                "CachedContent not found (or permission denied)"))
+            elif match.group(2) == "generateContent":
+                self.send_json(200, fake.generate(body))
+            else:
+                self.stream(fake.generate(body))
+        else:
+            self.send_json(404, _error_body(404, "NOT_FOUND", f"Unknown path {path}"))
+
+    def do_PATCH(self):
+        path = urlparse(self.path).path
+        body = json.loads(self.read_body() or b"{}")
+        name = path[len("/v1beta/"):]
+
+        cache = self.fake.live_cache(name) if path.startswith("/v1beta/cachedContents/") else None
+        if cache is None:
+            self.send_json(404, _error_body(404, "NOT_FOUND", f"{name} not found"))
+            return
+        if "ttl" in body:
+            self.fake.set_ttl(cache, body["ttl"])
+        self.send_json(200, _public_cache(cache))
+
+    def handle_upload(self, url, raw: bytes):
+        fake = self.fake
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        upload_id = parse_qs(url.query).get("upload_id", [None])[0]
+
+        if "start" in command:
+            upload_id = str(next(fake.ids))
+            meta = json.loads(raw or b"{}").get("file", {})
+            fake.uploads[upload_id] = {"meta": meta, "data": b""}
+            host = self.headers.get("Host")
+            self.send_json(200, {}, {
+                "X-Goog-Upload-URL": f"http://{host}/upload/v1beta/files?upload_id={upload_id}",
+                "X-Goog-Upload-Status": "active"
+            })
+            return
+
+        upload = fake.uploads[upload_id]
+        upload["data"] += raw
+        if "finalize" not in command:
+            self.send_json(200, {}, {"X-Goog-Upload-Status": "active"})
+            return
+
+        name = f"files/fake-in-{upload_id}"
+        fake.files[name] = upload["data"]
+        self.send_json(200, {"file": {
+            "name": name,
+            "displayName": upload["meta"].get("displayName", ""),
+            "mimeType": upload["meta"].get("mimeType", "application/octet-stream"),
+            "sizeBytes": str(len(upload["data"])),
+            "state": "ACTIVE"
+        }}, {"X-Goog-Upload-Status": "final"})
+
+    def stream(self, response: dict):
+        """
+        Envia a resposta como SSE, quebrando o texto do primeiro candidato em
+        pedaços com um pequeno intervalo entre eles.
+        """
+        text = _text_of(response["candidates"][0]["content"])
+        size = max(1, self.fake.args.stream_chunk)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, piece in enumerate(pieces):
+            chunk = {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": piece}]},
+                    "index": 0
+                }],
+                "modelVersion": response["modelVersion"]
+            }
+            if i == len(pieces) - 1:
+                chunk["candidates"][0]["finishReason"] = "STOP"
+                chunk["usageMetadata"] = response["usageMetadata"]
+
+            data = f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.fake.args.stream_interval)
+
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _lognormal_mu(mean: float, sigma: float) -> float:
+    return math.log(mean) - sigma ** 2 / 2
+
+
+def _error_body(code: int, status: str, message: str, retry_delay=None, reason=None) -> dict:
+    error = {"code": code, "message": message, "status": status}
+    if retry_delay is not None:
+        error["details"] = [{
+            "@type": "type.googleapis.com/google.rpc.RetryInfo",
+            "retryDelay": f"{retry_delay:.0f}s"
+        }]
+    if reason is not None:
+        error["details"] = [{
+            "@type": "type.googleapis.com/google.rpc.ErrorInfo",
+            "reason": reason,
+            "domain": "googleapis.com"
+        }]
+    return {"error": error}
+
+
+def _text_of(content: dict) -> str:
+    return "".join(part.get("text", "") for part in content.get("parts", []))
+
+
+def _request_text(body: dict) -> str:
+    return "".join(_text_of(content) for content in body.get("contents", []))
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def _public_cache(cache: dict) -> dict:
+    return {k: v for k, v in cache.items() if k not in ("tokens", "expires")}
+
+
+def _rfc3339(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def _predictions(code: str, labels: str, seed: int) -> list:
+    lines = max(1, code.count("\n") + 1)
+    predictions = []
+    for label in [l.strip() for l in labels.split(",") if l.strip()]:
+        digest = hashlib.sha256(f"{seed}:{label}:{code}".encode("utf-8")).digest()
+        predictions.append({"label": label, "line of Code": digest[0] % lines + 1})
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Servidor local que imita a API do Gemini para testes de vazão offline."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Porta de escuta (default: 8765)")
+    parser.add_argument(
+        "--latency-mean", type=float, default=1.0,
+        help="Latência média em segundos de cada geração (default: 1.0)"
+    )
+    parser.add_argument(
+        "--latency-sigma", type=float, default=0.5,
+        help="Desvio da lognormal de latência; maior = cauda mais longa (default: 0.5)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0,
+        help="Probabilidade de responder 503 (default: 0)"
+    )
+    parser.add_argument(
+        "--burst-rate", type=float, default=0.0,
+        help="Probabilidade de uma requisição iniciar uma rajada de 429 (default: 0)"
+    )
+    parser.add_argument(
+        "--burst-duration", type=float, default=5.0,
+        help="Duração em segundos de cada rajada de 429 (default: 5)"
+    )
+    parser.add_argument(
+        "--rpm-per-key", type=int, default=0,
+        help="Cota de requisições por minuto de cada chave (x-goog-api-key); acima dela "
+             "responde 429 (default: 0 = sem limite)"
+    )
+    parser.add_argument(
+        "--invalid-keys", default="",
+        help="Chaves, separadas por vírgula, que recebem 400 API_KEY_INVALID"
+    )
+    parser.add_argument(
+        "--max-cache-ttl", type=float, default=0,
+        help="Limita o TTL dos caches de contexto, em segundos, para testar a expiração no meio "
+             "da execução (default: 0 = respeita o TTL pedido)"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.0,
+        help="Probabilidade de um candidato vir com JSON inválido (default: 0)"
+    )
+    parser.add_argument(
+        "--batch-delay", type=float, default=3.0,
+        help="Tempo em segundos até um batch terminar (default: 3)"
+    )
+    parser.add_argument(
+        "--stream-chunk", type=int, default=16,
+        help="Caracteres por evento no modo streaming (default: 16)"
+    )
+    parser.add_argument(
+        "--stream-interval", type=float, default=0.05,
+        help="Intervalo em segundos entre eventos no modo streaming (default: 0.05)"
+    )
+    parser.add_argument("--model-version", default="fake-gemini", help="modelVersion devolvido")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos sorteios (default: 0)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Loga cada requisição")
+    args = parser.parse_args()
+
+    Handler.fake = FakeGemini(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+
+    print(f"🧪 Gemini falso ouvindo em http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {json.dumps(Handler.fake.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,740 @@
 import json
 import argparse
+import asyncio
 import os
 import time
-from google import genai
-from google.genai import types
+from key_pool import API_KEYS_ENV, KeyPool, load_api_keys
+from rate_limiter import estimate_tokens
+from telemetry import Telemetry
+from batch_requester import (
+    DEFAULT_BATCH_FILE, SUCCESS_STATES, write_batch_requests, submit_batch,
+    wait_for_batch, iter_batch_results
+)
+from code_chunking import DEFAULT_CHUNK_TOKENS, chunk_code, merge_chunks
+from code_minify import minify, remap_lines
+from code_slicing import slice_code
+from content_dedup import group_duplicates
+from corpus import discover_files, load_labels
+from context_cache import DEFAULT_TTL, get_or_create_context_cache
+from hedging import Hedger
+from model_cascade import Cascade, DEFAULT_THRESHOLD
+from prompt_packing import build_packed_prompt, pack_files
+from run_planner import build_plan, count_tokens, print_plan
+from sharding import DEFAULT_ERROR_OUTPUT, parse_shard, select_shard, shard_path
+from singleflight import SingleFlight
+from stream_parsing import StreamingJsonParser
+from response_parsing import (
+    PREDICTIONS_SCHEMA, parse_response, validate_packed, validate_predictions, vote_predictions
+)
+from scheduling import DEFAULT_HISTORY_PATH, LatencyModel, predicted_makespan, schedule
+from retry_policy import (
+    DeferredQueue, RetryLater, backoff_delay, describe_error, is_auth_error,
+    is_cached_content_error, is_rate_limited, is_retryable, retry_after_hint
+)
+from result_journal import ResultJournal, compact, journal_path_for, scan_done
+from run_manifest import RunManifest, file_fingerprint, manifest_path_for
+from response_cache import (
+    ResponseCache, cache_key, DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_MB
+)
 
 MAX_RETRIES = 3
-RETRY_DELAY = 5
+MODEL = "gemini-2.5-flash"
+DEFAULT_CONCURRENCY = 4
+REQUEST_TIMEOUT = 120
+DEFAULT_VOTE_TEMPERATURE = 0.7
 
-def build_prompt(vul_code: str, labels2: list[str]) -> str:
+INSTRUCTION = (
+    "Which of the following vulnerabilities from list of vulnerabilities exist "
+    "in the python code which is delimited with triple backticks. also give the "
+    "number of the line of the vulnerability in the code."
+)
+FORMAT_INSTRUCTION = (
+    "Format your response as a list of JSON objects with \"label\" and \"line of Code\" "
+    "as the keys for each element. Only answer with JSON."
+)
+
+# Prefixo estável usado com --context-cache: as instruções vão uma única vez
+# como system_instruction e cada requisição leva só o código e os labels.
+SYSTEM_INSTRUCTION = INSTRUCTION + "\n\n" + FORMAT_INSTRUCTION
+
+
+def build_file_prompt(vul_code: str, labels2: list[str]) -> str:
     return (
-        "Which of the following vulnerabilities from list of vulnerabilities exist "
-        "in the python code which is delimited with triple backticks. also give the "
-        "number of the line of the vulnerability in the code.\n\n"
         f"Python code:\n'''\n{vul_code}\n'''\n\n"
         "List of vulnerabilities:\n"
-        + ", ".join(labels2) +
-        "\n\nFormat your response as a list of JSON objects with \"label\" and \"line of Code\" "
-        "as the keys for each element. Only answer with JSON."
+        + ", ".join(labels2)
     )
 
+
+def build_prompt(vul_code: str, labels2: list[str]) -> str:
+    return (
+        INSTRUCTION + "\n\n"
+        + build_file_prompt(vul_code, labels2)
+        + "\n\n" + FORMAT_INSTRUCTION
+    )
+
+
+class Requester:
+    """
+    Executa as chamadas ao Gemini de forma assíncrona, limitando quantas
+    requisições ficam em voo ao mesmo tempo.
+    """
+
+    def __init__(self, pool, concurrency=DEFAULT_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 cache=None, cache_only=False, journal=None,
+                 system_instruction=None, structured=True,
+                 stream=False, hedger=None, cascade=None, sast_lines=None, telemetry=None,
+                 duplicates=None, minify=False, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                 sast_slice=False, latency_model=None, vote=1,
+                 vote_temperature=DEFAULT_VOTE_TEMPERATURE):
+        self.pool = pool
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cache = cache
+        self.cache_only = cache_only
+        self.journal = journal
+        self.system_instruction = system_instruction
+        self.structured = structured
+        self.stream = stream
+        self.hedger = hedger
+        self.cascade = cascade or Cascade([MODEL])
+        self.models = self.cascade.models
+        self.sast_lines = sast_lines or {}
+        self.telemetry = telemetry or Telemetry()
+        self.singleflight = SingleFlight()
+        self.latency_model = latency_model or LatencyModel(None)
+        self.duplicates = duplicates or {}
+        self.minify = minify
+        self.sast_slice = sast_slice
+        self.vote = vote
+        self.vote_temperature = vote_temperature
+        self.chunk_tokens = chunk_tokens
+        self.partial = {}
+        self.tiers = {}
+        self.missed = set()
+        self.line_maps = {}
+        self.tokens_saved = {}
+        self.stream_timings = []
+
+    def generation_config(self, packed=False) -> dict:
+        # Identifica a resposta (entra na chave do cache e no batch); usa o
+        # texto das instruções e não o nome do CachedContent, que muda entre execuções.
+        config = {"temperature": 0.0}
+        if self.vote > 1:
+            config["temperature"] = self.vote_temperature
+            config["candidate_count"] = self.vote
+        if self.system_instruction:
+            config["system_instruction"] = self.system_instruction
+        if self.structured:
+            config["response_mime_type"] = "application/json"
+            # No pacote as chaves são os nomes dos arquivos; só exigimos JSON
+            if not packed:
+                config["response_json_schema"] = PREDICTIONS_SCHEMA
+        return config
+
+    def request_config(self, packed=False, model=None, cached_content=None):
+        # Importado aqui para o --plan não carregar o SDK
+        from google.genai import types
+
+        config = self.generation_config(packed)
+        # O CachedContent é de uma chave e criado para o primeiro modelo da cascata
+        if cached_content and (model or self.models[0]) == self.models[0]:
+            config.pop("system_instruction", None)
+            config["cached_content"] = cached_content
+        return types.GenerateContentConfig(**config)
+
+    def prompt_version(self, pack_tokens=0) -> str:
+        # Muda quando o modelo, a configuração ou o texto fixo do prompt mudam
+        config = self.generation_config()
+        if self.minify:
+            config["minify"] = True
+        if self.sast_slice:
+            config["slice"] = True
+        # Outro tamanho de janela muda os prompts enviados dos arquivos grandes
+        config["chunk_tokens"] = self.chunk_tokens
+        # O pacote muda o prompt; o limiar muda quais respostas são aceitas
+        config["pack_tokens"] = pack_tokens
+        if self.cascade.enabled:
+            config["cascade_threshold"] = self.cascade.threshold
+        return cache_key(",".join(self.models), config, self.build("", []))
+
+    def read_code(self, file_path: str):
+        """
+        Lê o arquivo e aplica o pré-processamento pedido. Devolve (código,
+        anotado): um recorte do --slice já traz os números de linha originais
+        e não pode ser reduzido nem dividido em janelas.
+        """
+        with open(file_path, "r", encoding="utf-8") as f:
+            code = f.read()
+
+        rel_path = os.path.basename(file_path)
+        short = slice_code(code, self.sast_lines.get(rel_path)) if self.sast_slice else None
+        annotated = short is not None
+        if short is None and self.minify:
+            short, self.line_maps[rel_path] = minify(code)
+
+        if short is None:
+            return code, False
+        self.tokens_saved[rel_path] = estimate_tokens(code) - estimate_tokens(short)
+        return short, annotated
+
+    def remap(self, rel_path: str, predictions):
+        # Traduz as linhas do código reduzido para as do arquivo original
+        line_map = self.line_maps.get(rel_path)
+        if predictions is None or line_map is None:
+            return predictions
+        return remap_lines(predictions, line_map)
+
+    def build(self, code: str, labels2: list[str]) -> str:
+        if self.system_instruction:
+            return build_file_prompt(code, labels2)
+        return build_prompt(code, labels2)
+
+    async def generate(self, prompt: str, packed=False, name=None, model=None, attempt=1,
+                       dispatched=None):
+        """
+        Faz a chamada e devolve o texto da resposta; no modo de votação,
+        a lista com o texto de cada candidato. `dispatched()` é chamado quando
+        a requisição sai, já com a cota garantida.
+        """
+        model = model or self.models[0]
+        estimated = estimate_tokens(prompt)
+
+        # Uma chave recusada ou sem cota é trocada na hora por outra do pool;
+        # só quando não sobra nenhuma o erro volta para a política de retry.
+        while True:
+            api_key = await self.pool.pick(estimated)
+            api_key.in_flight += 1
+            started = time.monotonic()
+            try:
+                await api_key.limiter.acquire(estimated)
+                started = time.monotonic()
+                if dispatched is not None:
+                    dispatched()
+                cached_content = api_key.cached_content
+                if self.stream:
+                    response, text = await asyncio.wait_for(
+                        self.generate_stream(prompt, packed, name, model, api_key, cached_content),
+                        timeout=self.timeout
+                    )
+                else:
+                    response = await asyncio.wait_for(
+                        api_key.client.aio.models.generate_content(
+                            model=model,
+                            contents=prompt,
+                            config=self.request_config(packed, model, cached_content)
+                        ),
+                        timeout=self.timeout
+                    )
+                    # Com vários candidatos o .text só olha o primeiro (e avisa)
+                    text = (response.text or "") if self.vote == 1 else None
+                break
+            except Exception as e:
+                self.telemetry.record(name, model, attempt, time.monotonic() - started,
+                                      error=describe_error(e))
+                if cached_content and is_cached_content_error(e):
+                    # Vale para todas as requisições em voo com esse cache,
+                    # mas só a primeira avisa
+                    if api_key.cached_content == cached_content:
+                        print(f"🧊 Cache de contexto {cached_content} expirou ou foi apagado; "
+                              f"enviando as instruções como system_instruction")
+                        api_key.cached_content = None
+                    continue
+                if is_auth_error(e):
+                    self.pool.disable(api_key, f"{e.code} {e.status}")
+                    if self.pool.active:
+                        continue
+                elif is_rate_limited(e):
+                    self.pool.cool_down(api_key, retry_after_hint(e) or backoff_delay(1))
+                    if self.pool.ready():
+                        continue
+                raise
+            finally:
+                api_key.in_flight -= 1
+
+        latency = time.monotonic() - started
+        usage = response.usage_metadata if response is not None else None
+        candidates = (response.candidates or []) if response is not None else []
+        finish_reason = candidates[0].finish_reason if candidates else None
+
+        self.telemetry.record(name, model, attempt, latency, usage,
+                              getattr(finish_reason, "name", finish_reason))
+        self.cascade.observe(
+            model, latency, (usage.total_token_count or 0) if usage is not None else 0
+        )
+        if usage is not None:
+            self.latency_model.observe(model, usage.prompt_token_count or 0, latency)
+            api_key.limiter.settle(estimated, usage.prompt_token_count)
+
+        if self.vote > 1:
+            return [
+                "".join(part.text for part in candidate.content.parts or [] if part.text)
+                if candidate.content is not None else ""
+                for candidate in candidates
+            ]
+        return text
+
+    async def generate_stream(self, prompt: str, packed=False, name=None, model=None,
+                              api_key=None, cached_content=None):
+        """
+        Consome a resposta em streaming, registrando o tempo até o primeiro
+        byte e até o primeiro achado. Aborta assim que fica claro que a
+        resposta não é JSON, para a nova tentativa começar mais cedo.
+        Devolve (último pedaço, texto completo); o último traz o usage_metadata.
+        """
+        started = time.monotonic()
+        timing = {"filename": name, "ttfb": None, "first_finding": None, "total": None}
+        parser = StreamingJsonParser()
+        parts = []
+        last = None
+
+        stream = await api_key.client.aio.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=self.request_config(packed, model, cached_content)
+        )
+        try:
+            async for chunk in stream:
+                elapsed = time.monotonic() - started
+                if timing["ttfb"] is None:
+                    timing["ttfb"] = elapsed
+
+                last = chunk
+                piece = chunk.text or ""
+                parts.append(piece)
+
+                if parser.feed(piece) and timing["first_finding"] is None:
+                    timing["first_finding"] = elapsed
+                if parser.invalid:
+                    raise json.JSONDecodeError("Response is not JSON", "".join(parts), 0)
+        finally:
+            await stream.aclose()
+
+        timing["total"] = time.monotonic() - started
+        self.stream_timings.append(timing)
+
+        ttff = f"{timing['first_finding']:.2f}s" if timing["first_finding"] is not None else "-"
+        print(f"   📶 {name}: 1º byte {timing['ttfb'] or 0:.2f}s | 1º achado {ttff} | total {timing['total']:.2f}s")
+
+        return last, "".join(parts)
+
+    def in_cache(self, prompt: str, packed=False, model=None) -> bool:
+        # Como lookup(), mas sem contar acerto/falta nem marcar o uso
+        if self.cache is None:
+            return False
+        key = cache_key(model or self.models[0], self.generation_config(packed), prompt)
+        return self.cache.contains(key)
+
+    def cached(self, file_path: str, labels2: list[str]) -> bool:
+        # Todas as janelas do arquivo já respondidas no cache
+        if self.cache is None:
+            return False
+        _, chunks = self.prepare(file_path, labels2)
+        return all(self.in_cache(prompt) for _, prompt in chunks)
+
+    def lookup(self, prompt: str, packed=False, model=None):
+        """
+        Consulta o cache. Devolve (chave do cache, predições em cache ou None).
+        """
+        if self.cache is None:
+            return None, None
+
+        key = cache_key(model or self.models[0], self.generation_config(packed), prompt)
+        # Uma nova tentativa depois de uma falta não consulta (nem conta) de novo
+        if key in self.missed:
+            return key, None
+        hit = self.cache.get(key)
+        if hit is None:
+            self.missed.add(key)
+            return key, None
+        return key, hit[1]
+
+    def prepare(self, file_path: str, labels2: list[str]):
+        """
+        Monta os prompts de um arquivo: um só, ou um por janela quando o
+        arquivo passa de chunk_tokens. Devolve (nome, [(deslocamento, prompt), ...]).
+        """
+        rel_path = os.path.basename(file_path)
+        code, annotated = self.read_code(file_path)
+        if self.chunk_tokens and not annotated:
+            windows = chunk_code(code, self.chunk_tokens)
+        else:
+            windows = [(0, code)]
+
+        return rel_path, [(offset, self.build(text, labels2)) for offset, text in windows]
+
+    async def request(self, prompt: str, name: str, key=None, packed=False, attempt=1,
+                      model=None, defer_invalid=True):
+        """
+        Como send(), mas pedidos idênticos (mesmo modelo, configuração e
+        prompt) que estejam em voo ao mesmo tempo viram uma só chamada.
+        """
+        model = model or self.models[0]
+        flight = (cache_key(model, self.generation_config(packed), prompt), defer_invalid)
+        return await self.singleflight.do(flight, lambda: self.send(
+            prompt, name, key, packed, attempt, model, defer_invalid
+        ))
+
+    async def send(self, prompt: str, name: str, key=None, packed=False, attempt=1,
+                   model=None, defer_invalid=True):
+        """
+        Faz uma tentativa de chamada à IA. Devolve (raw, resultado, erro);
+        resultado é None em caso de falha definitiva. Falhas temporárias com
+        tentativas sobrando levantam RetryLater em vez de dormir aqui.
+        Com defer_invalid=False, uma resposta inválida é devolvida como falha
+        na hora (a cascata prefere subir de modelo a repetir o mesmo).
+        """
+        model = model or self.models[0]
+        validate = validate_packed if packed else validate_predictions
+        texts = []
+
+        async def attempt_once(dispatched=None):
+            text = await self.generate(prompt, packed, name, model, attempt, dispatched)
+            texts.append(text)
+            if self.vote > 1:
+                return vote_predictions(text, validate)
+            return parse_response(text, validate)
+
+        async with self.semaphore:
+            try:
+                print(f"   🔁 {name}: tentativa {attempt}/{MAX_RETRIES}")
+
+                if self.hedger is not None:
+                    raw, ai_result = await self.hedger.run(attempt_once)
+                else:
+                    raw, ai_result = await attempt_once()
+
+                if key is not None:
+                    self.cache.put(key, model, raw, ai_result)
+                    self.missed.discard(key)
+
+                return raw, ai_result, None
+
+            except Exception as e:
+                raw = texts[-1] if texts else None
+                last_error = describe_error(e)
+                retryable = is_retryable(e) and (defer_invalid or not isinstance(e, ValueError))
+                hint = retry_after_hint(e)
+
+        kind = "temporário" if retryable else "definitivo"
+        print(f"   ⚠️ {name}: erro {kind}: {last_error}")
+
+        if retryable and attempt < MAX_RETRIES:
+            raise RetryLater(backoff_delay(attempt, hint), last_error)
+
+        return raw, None, last_error
+
+    async def query(self, index: int, total: int, rel_path: str, chunks: list, model: str,
+                    attempt=1, defer_invalid=True):
+        """
+        Consulta o cache ou a IA para cada janela do arquivo, em paralelo, e
+        junta as predições com as linhas corrigidas pelo deslocamento.
+        Devolve (raw, resultado, erro) como request(); o arquivo falha se
+        qualquer janela falhar.
+        """
+        tag = f" [{model}]" if self.cascade.enabled else ""
+        # Janelas que já deram certo não são refeitas quando o arquivo é adiado
+        done = self.partial.setdefault((rel_path, model), {}) if len(chunks) > 1 else {}
+
+        async def query_chunk(i: int, prompt: str):
+            name = rel_path if len(chunks) == 1 else f"{rel_path} [janela {i}/{len(chunks)}]"
+            if i in done:
+                return None, done[i], None
+            key, cached = self.lookup(prompt, model=model)
+
+            if cached is not None:
+                print(f"[{index}/{total}] 💾 Resposta em cache{tag}: {name}")
+                return None, cached, None
+            if self.cache_only:
+                print(f"[{index}/{total}] ⏭️ Sem resposta em cache{tag}: {name}")
+                return None, None, "Not in cache (--cache-only)"
+
+            print(f"\n[{index}/{total}] 🔹 Chamando IA{tag} para: {name} ...")
+            outcome = await self.request(
+                prompt, name, key, attempt=attempt, model=model, defer_invalid=defer_invalid
+            )
+            if outcome[1] is not None:
+                done[i] = outcome[1]
+            return outcome
+
+        if len(chunks) == 1:
+            return await query_chunk(1, chunks[0][1])
+
+        outcomes = await asyncio.gather(
+            *(query_chunk(i, prompt) for i, (_, prompt) in enumerate(chunks, start=1)),
+            return_exceptions=True
+        )
+
+        # Se alguma janela foi adiada, o arquivo volta para a fila e só as
+        # janelas que faltam são refeitas na próxima tentativa
+        raised = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if raised:
+            unexpected = [e for e in raised if not isinstance(e, RetryLater)]
+            if unexpected:
+                self.partial.pop((rel_path, model), None)
+                raise unexpected[0]
+            raise max(raised, key=lambda e: e.delay)
+        self.partial.pop((rel_path, model), None)
+
+        for i, (raw, ai_result, error) in enumerate(outcomes, start=1):
+            if ai_result is None:
+                return raw, None, f"Janela {i}/{len(chunks)}: {error}"
+
+        merged = merge_chunks([(offset, ai_result)
+                               for (offset, _), (_, ai_result, _) in zip(chunks, outcomes)])
+        return None, merged, None
+
+    async def analyze(self, index: int, total: int, file_path: str, labels2: list[str],
+                      attempt=1):
+        rel_path, chunks = self.prepare(file_path, labels2)
+        last_tier = len(self.models) - 1
+
+        # Um arquivo adiado depois de subir de modelo volta no nível em que
+        # estava, sem pagar de novo as chamadas que já tinham falhado abaixo
+        for tier in range(self.tiers.get(rel_path, 0), len(self.models)):
+            model = self.models[tier]
+            raw, ai_result, last_error = await self.query(
+                index, total, rel_path, chunks, model, attempt, defer_invalid=tier == last_tier
+            )
+            ai_result = self.remap(rel_path, ai_result)
+
+            if tier < last_tier:
+                reason = self.cascade.escalation_reason(
+                    ai_result, labels2, self.sast_lines.get(rel_path)
+                )
+                if reason is not None:
+                    print(f"   🪜 {rel_path}: subindo para {self.models[tier + 1]} ({reason})")
+                    self.cascade.escalations[tier] += 1
+                    self.tiers[rel_path] = tier + 1
+                    continue
+
+            if ai_result is not None:
+                self.cascade.resolved[tier] += 1
+            break
+        self.tiers.pop(rel_path, None)
+
+        # =============================
+        # Falha definitiva
+        # =============================
+        if ai_result is None:
+            print(f"❌ Falha definitiva em {rel_path}\n")
+            return None, {
+                "filename": rel_path,
+                "error": last_error,
+                "raw": raw
+            }
+
+        print(f"✔️ Processado com sucesso: {rel_path}\n")
+        return {
+            "filename": rel_path,
+            "ai_predictions": ai_result
+        }, None
+
+    async def analyze_pack(self, pack: list, total: int, attempt=1):
+        """
+        Analisa vários arquivos pequenos em uma única requisição e separa a
+        resposta por arquivo. Devolve (resultados, sobras): as sobras são os
+        arquivos cuja parte não veio válida e que devem ser refeitos sozinhos.
+        """
+        if len(pack) == 1:
+            index, file_path, labels2 = pack[0]
+            return [await self.analyze(index, total, file_path, labels2, attempt)], []
+
+        files = []
+        for _, file_path, labels2 in pack:
+            files.append((os.path.basename(file_path), self.read_code(file_path)[0], labels2))
+
+        names = ", ".join(name for name, _, _ in files)
+        first, last = pack[0][0], pack[-1][0]
+        prompt = build_packed_prompt(files)
+        key, parts = self.lookup(prompt, packed=True)
+
+        if parts is not None:
+            print(f"[{first}-{last}/{total}] 💾 Pacote em cache: {names}")
+        elif not self.cache_only:
+            print(f"\n[{first}-{last}/{total}] 📦 Chamando IA para o pacote: {names} ...")
+            _, parts, _ = await self.request(
+                prompt, f"pacote {first}-{last}", key, packed=True, attempt=attempt
+            )
+
+        if not isinstance(parts, dict):
+            parts = {}
+
+        outcomes = []
+        leftovers = []
+        for item, (rel_path, _, labels2) in zip(pack, files):
+            try:
+                part = self.remap(rel_path, validate_predictions(parts[rel_path]))
+            except (KeyError, ValueError):
+                part = None
+
+            # O pacote vai sempre para o primeiro modelo; quem precisar subir
+            # é refeito sozinho a partir do nível seguinte
+            reason = None
+            if part is not None and self.cascade.enabled:
+                reason = self.cascade.escalation_reason(
+                    part, labels2, self.sast_lines.get(rel_path)
+                )
+
+            if reason is not None:
+                print(f"   🪜 {rel_path}: subindo para {self.models[1]} ({reason})")
+                self.cascade.escalations[0] += 1
+                self.tiers[rel_path] = 1
+                leftovers.append(item)
+            elif part is not None:
+                print(f"✔️ Processado com sucesso: {rel_path}")
+                self.cascade.resolved[0] += 1
+                outcomes.append(({"filename": rel_path, "ai_predictions": part}, None))
+            else:
+                if parts:
+                    print(f"   ↩️ {rel_path}: ausente ou inválido no pacote, refazendo sozinho")
+                leftovers.append(item)
+
+        return outcomes, leftovers
+
+    def record(self, result, error):
+        entry = result if result is not None else error
+        write = self.journal.result if result is not None else self.journal.error
+        write(entry)
+        self.line_maps.pop(entry["filename"], None)
+
+        # Cópias de conteúdo idêntico recebem a mesma resposta
+        for name in self.duplicates.get(entry["filename"], ()):
+            write(dict(entry, filename=name))
+
+    async def process(self, pack: list, total: int, attempt: int, deferred: DeferredQueue):
+        try:
+            outcomes, leftovers = await self.analyze_pack(pack, total, attempt)
+        except RetryLater as e:
+            names = ", ".join(os.path.basename(file_path) for _, file_path, _ in pack)
+            print(f"   ⏳ {names}: adiado por {e.delay:.1f}s")
+            deferred.push(pack, attempt + 1, e.delay)
+            return
+
+        for outcome in outcomes:
+            self.record(*outcome)
+        for item in leftovers:
+            deferred.push([item], 1, 0)
+
+    async def run(self, files_to_process: list[str], labels_by_file: dict, workers: int,
+                  pack_tokens=0):
+        total = len(files_to_process)
+        deferred = DeferredQueue()
+
+        if pack_tokens > 0:
+            queue = pack_files(files_to_process, labels_by_file, pack_tokens)
+        else:
+            queue = (
+                [(index, file_path, labels_by_file.get(os.path.basename(file_path), []))]
+                for index, file_path in enumerate(files_to_process, start=1)
+            )
+
+        # Cada worker puxa o próximo arquivo (ou pacote) assim que termina o
+        # anterior e grava o resultado no diário; nada se acumula em memória.
+        # Falhas temporárias vão para a fila de adiados, que só é esvaziada
+        # depois da fila principal, para não travar os arquivos seguintes.
+        async def worker():
+            for pack in queue:
+                await self.process(pack, total, 1, deferred)
+
+            while deferred:
+                pack, attempt = await deferred.pop()
+                await self.process(pack, total, attempt, deferred)
+
+        # Se um worker falhar de forma inesperada (ou o usuário der Ctrl-C),
+        # o TaskGroup cancela as demais requisições em voo.
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(min(workers, total)):
+                tg.create_task(worker())
+
+    def run_batch(self, files_to_process: list[str], labels_by_file: dict, batch_file: str):
+        """
+        Envia todos os arquivos sem resposta em cache como um único job da
+        Batch API e grava o resultado no diário no mesmo esquema do modo interativo.
+        """
+        pending = []
+        chunk_keys = {}
+        offsets = {}
+        parts = {}
+        errors = {}
+
+        for file_path in files_to_process:
+            labels2 = labels_by_file.get(os.path.basename(file_path), [])
+            rel_path, chunks = self.prepare(file_path, labels2)
+            offsets[rel_path] = [offset for offset, _ in chunks]
+            parts[rel_path] = [None] * len(chunks)
+
+            for i, (_, prompt) in enumerate(chunks):
+                key, cached = self.lookup(prompt)
+                if cached is not None:
+                    parts[rel_path][i] = cached
+                else:
+                    # Cada janela de um arquivo grande é um pedido separado no batch
+                    batch_key = rel_path if len(chunks) == 1 else f"{rel_path}#{i + 1}"
+                    pending.append((batch_key, prompt))
+                    chunk_keys[batch_key] = (rel_path, i, key)
+
+            if all(part is not None for part in parts[rel_path]):
+                self.record_batch_file(rel_path, offsets.pop(rel_path), parts.pop(rel_path))
+
+        print(f"💾 {len(files_to_process) - len(parts)} arquivos em cache, "
+              f"{len(parts)} enviados no batch.")
+
+        if not pending:
+            return
+
+        write_batch_requests(batch_file, pending, self.generation_config())
+        job = submit_batch(self.pool.client, self.models[0], batch_file)
+        print(f"📦 Batch criado: {job.name}")
+
+        job, state = wait_for_batch(self.pool.client, job.name)
+        if state not in SUCCESS_STATES:
+            print(f"❌ Batch terminou em {state}: {job.error}")
+
+        for batch_key, text, error in iter_batch_results(
+            self.pool.client, job, batch_file + ".results"
+        ):
+            if batch_key not in chunk_keys:
+                continue
+            rel_path, i, key = chunk_keys.pop(batch_key)
+
+            if error is not None:
+                errors.setdefault(rel_path, {"filename": rel_path, "error": error, "raw": None})
+                continue
+            try:
+                raw, ai_result = parse_response(text)
+            except json.JSONDecodeError:
+                errors.setdefault(rel_path, {
+                    "filename": rel_path, "error": "Invalid JSON", "raw": text
+                })
+                continue
+            except ValueError as e:
+                errors.setdefault(rel_path, {
+                    "filename": rel_path, "error": f"Invalid schema: {e}", "raw": text
+                })
+                continue
+
+            if key is not None:
+                self.cache.put(key, self.models[0], raw, ai_result)
+            parts[rel_path][i] = ai_result
+
+        for rel_path, _, _ in chunk_keys.values():
+            errors.setdefault(rel_path, {
+                "filename": rel_path, "error": "Missing from batch output", "raw": None
+            })
+
+        for rel_path in parts:
+            if rel_path in errors:
+                self.record(None, errors[rel_path])
+            else:
+                self.record_batch_file(rel_path, offsets[rel_path], parts[rel_path])
+
+    def record_batch_file(self, rel_path: str, offsets: list[int], parts: list):
+        ai_result = parts[0] if len(parts) == 1 else merge_chunks(list(zip(offsets, parts)))
+        self.record({"filename": rel_path, "ai_predictions": self.remap(rel_path, ai_result)},
+                    None)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Executa IA como assistente de SAST em todos os arquivos Python de um diretório."
@@ -33,125 +748,451 @@ def main():
         help="Arquivo .json contendo labels do SAST (ex: Bandit parser)"
     )
     parser.add_argument(
-        "-ak", "--api-key", required=True,
+        "-ak", "--api-key",
         help="Chave da API do Google Gemini"
     )
+    parser.add_argument(
+        "--api-keys-file",
+        help=f"Arquivo com várias chaves de API, uma por linha, usadas em pool (também lidas de "
+             f"${API_KEYS_ENV}, separadas por vírgula)"
+    )
     parser.add_argument(
         "-o", "--output", default="AiVulnAnalysis.json",
         help="Arquivo JSON de saída (default: AiVulnAnalysis.json)"
     )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Número máximo de requisições simultâneas (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "-t", "--timeout", type=float, default=REQUEST_TIMEOUT,
+        help=f"Timeout em segundos de cada requisição (default: {REQUEST_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--rpm", type=int, default=0,
+        help="Cota de requisições por minuto de cada chave/projeto (default: 0 = sem limite)"
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=0,
+        help="Cota de tokens de entrada por minuto de cada chave/projeto (default: 0 = sem limite)"
+    )
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH,
+        help=f"Arquivo SQLite do cache de respostas (default: {DEFAULT_CACHE_PATH})"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Não lê nem grava o cache de respostas"
+    )
+    parser.add_argument(
+        "--cache-only", action="store_true",
+        help="Apenas reproduz respostas do cache, sem chamar a API"
+    )
+    parser.add_argument(
+        "--cache-max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+        help=f"Idade máxima das entradas do cache em dias (default: {DEFAULT_MAX_AGE_DAYS}, 0 = sem limite)"
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+        help=f"Tamanho máximo do cache em MB (default: {DEFAULT_MAX_MB}, 0 = sem limite)"
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Envia todos os arquivos como um job da Batch API em vez de chamadas interativas"
+    )
+    parser.add_argument(
+        "--batch-file", default=DEFAULT_BATCH_FILE,
+        help=f"Arquivo JSONL com os pedidos do batch (default: {DEFAULT_BATCH_FILE})"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Retoma uma execução interrompida, pulando arquivos já concluídos no diário"
+    )
+    parser.add_argument(
+        "--journal",
+        help="Diário JSONL com os resultados parciais (default: <output>.journal.jsonl)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Só envia à IA arquivos cujo conteúdo, labels, modelo ou prompt mudaram desde a "
+             "última execução; os demais reaproveitam o resultado guardado no manifesto"
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Caminho do manifesto do --incremental (default: <output>.manifest.json)"
+    )
+    parser.add_argument(
+        "--no-dedup", action="store_true",
+        help="Envia à IA também os arquivos de conteúdo e labels idênticos a outro já enviado"
+    )
+    parser.add_argument(
+        "--minify", action="store_true",
+        help="Remove comentários, docstrings e linhas em branco e encurta strings longas antes "
+             "de enviar; as linhas da resposta são traduzidas de volta para o arquivo original"
+    )
+    parser.add_argument(
+        "--slice", action="store_true",
+        help="Envia só as funções e comandos ligados às linhas apontadas pelo SAST (quem "
+             "contém, chama ou é chamado por elas), anotados com o número de linha original"
+    )
+    parser.add_argument(
+        "--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+        help=f"Arquivos acima desse número de tokens estimados são divididos em janelas "
+             f"sobrepostas, enviadas em paralelo (default: {DEFAULT_CHUNK_TOKENS}, 0 = desativado)"
+    )
+    parser.add_argument(
+        "--pack-tokens", type=int, default=0,
+        help="Agrupa arquivos pequenos em uma só requisição até este total de tokens (default: 0 = desativado)"
+    )
+    parser.add_argument(
+        "--context-cache", action="store_true",
+        help="Envia as instruções fixas uma única vez como cache de contexto da API"
+    )
+    parser.add_argument(
+        "--context-cache-ttl", type=int, default=DEFAULT_TTL,
+        help=f"TTL em segundos do cache de contexto (default: {DEFAULT_TTL})"
+    )
+    parser.add_argument(
+        "--no-structured-output", action="store_true",
+        help="Não pede resposta em JSON com esquema (response_json_schema) à API"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Usa a API de streaming, analisando o JSON à medida que chega"
+    )
+    parser.add_argument(
+        "--hedge-percentile", type=float, default=0,
+        help="Duplica a requisição que passar deste percentil de latência, ex: 95 (default: 0 = desativado)"
+    )
+    parser.add_argument(
+        "--hedge-budget", type=float, default=0.1,
+        help="Fração máxima de chamadas que podem ser duplicadas (default: 0.1)"
+    )
+    parser.add_argument(
+        "-m", "--models", default=MODEL,
+        help=f"Modelo ou cascata de modelos separados por vírgula, do mais barato ao mais caro "
+             f"(ex: gemini-2.5-flash-lite,gemini-2.5-flash,gemini-2.5-pro; default: {MODEL})"
+    )
+    parser.add_argument(
+        "--cascade-threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"Fração de linhas do SAST sem achado da IA acima da qual o arquivo sobe de modelo "
+             f"(default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--vote", type=int, default=1,
+        help="Pede N candidatos na mesma chamada (candidate_count) e mantém os achados em que a "
+             "maioria concorda, com a fração de concordância em \"agreement\" (default: 1 = desativado)"
+    )
+    parser.add_argument(
+        "--vote-temperature", type=float, default=DEFAULT_VOTE_TEMPERATURE,
+        help=f"Temperatura usada com --vote (default: {DEFAULT_VOTE_TEMPERATURE})"
+    )
+    parser.add_argument(
+        "--schedule", choices=["lpt", "walk"], default="lpt",
+        help="Ordem de envio: lpt = arquivos mais caros primeiro, pelo tamanho e pelo histórico "
+             "de latência; walk = ordem do os.walk (default: lpt)"
+    )
+    parser.add_argument(
+        "--latency-history", default=DEFAULT_HISTORY_PATH,
+        help=f"JSON com o histórico de latência por token usado pelo --schedule lpt "
+             f"(default: {DEFAULT_HISTORY_PATH})"
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Grava uma linha de métricas por chamada à API (.csv ou .jsonl)"
+    )
+    parser.add_argument(
+        "--prometheus",
+        help="Grava ao final um snapshot das métricas no formato texto do Prometheus"
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard,
+        help="Processa só a partição i de N (ex: 1/4), escolhida pelo hash do nome do arquivo; "
+             "saída e log de erros ganham o sufixo .shard-i-of-N (junte com sharding.py)"
+    )
+    parser.add_argument(
+        "--plan", action="store_true",
+        help="Só planeja: monta todos os prompts e mostra tempo previsto, tokens e acertos de "
+             "cache esperados, sem chamar a API de geração (não precisa de chave)"
+    )
+    parser.add_argument(
+        "--plan-count-tokens", action="store_true",
+        help="Com --plan, conta os tokens pelo endpoint countTokens em vez de estimar localmente"
+    )
+    parser.add_argument(
+        "--base-url",
+        help="URL base alternativa da API (ex: http://127.0.0.1:8765 para o fake_gemini_server.py)"
+    )
     args = parser.parse_args()
 
-    client = genai.Client(api_key=args.api_key)
+    if args.concurrency < 1:
+        parser.error("--concurrency deve ser >= 1")
+    if not 0 <= args.hedge_percentile < 100:
+        parser.error("--hedge-percentile deve estar entre 0 e 100")
+    if args.no_cache and args.cache_only:
+        parser.error("--cache-only não pode ser usado com --no-cache")
+    if args.batch and args.cache_only:
+        parser.error("--batch não pode ser usado com --cache-only")
+    if args.chunk_tokens < 0 or args.pack_tokens < 0:
+        parser.error("--chunk-tokens e --pack-tokens não podem ser negativos")
+    if args.vote < 1:
+        parser.error("--vote deve ser >= 1")
+    if args.vote > 1 and (args.stream or args.batch or args.pack_tokens):
+        parser.error("--vote não pode ser usado com --stream, --batch ou --pack-tokens")
+    if args.context_cache and args.pack_tokens:
+        parser.error("--context-cache não pode ser usado com --pack-tokens")
+    if args.plan_count_tokens and not args.plan:
+        parser.error("--plan-count-tokens só pode ser usado com --plan")
+
+    models = [model.strip() for model in args.models.split(",") if model.strip()]
+    if not models:
+        parser.error("--models precisa de pelo menos um modelo")
+    if args.batch and len(models) > 1:
+        parser.error("--batch não suporta cascata de modelos; passe um único modelo em --models")
+
+    api_keys = load_api_keys(args.api_key, args.api_keys_file)
+    if not api_keys and (not args.plan or args.plan_count_tokens):
+        parser.error(f"informe a chave com --api-key, --api-keys-file ou ${API_KEYS_ENV}")
 
-    with open(args.list, "r", encoding="utf-8") as f:
-        all_labels = json.load(f)
+    # O --plan sem countTokens não cria clientes: nem chega a importar o SDK
+    pool = None
+    if not args.plan or args.plan_count_tokens:
+        from google import genai
+        from google.genai import types
 
-    labels_by_file = {}
-    for item in all_labels:
-        fname = os.path.basename(item["filename"])
-        labels_by_file.setdefault(fname, []).append(item["cwe"])
+        http_options = types.HttpOptions(base_url=args.base_url) if args.base_url else None
+        pool = KeyPool(
+            api_keys, lambda key: genai.Client(api_key=key, http_options=http_options),
+            rpm=args.rpm, tpm=args.tpm
+        )
+
+    labels_by_file, lines_by_file = load_labels(args.list)
 
     # Contar quantos arquivos serão processados
-    files_to_process = []
-    for root, _, files in os.walk(args.source_code_dir):
-        for file in files:
-            if file.endswith(".py") and os.path.basename(file) in labels_by_file:
-                files_to_process.append(os.path.join(root, file))
+    files_to_process = discover_files(args.source_code_dir, labels_by_file)
 
-    for file in files_to_process:
-        print(os.path.basename(file))
+    error_output = DEFAULT_ERROR_OUTPUT
+    if args.shard:
+        index, count = args.shard
+        files_to_process = select_shard(files_to_process, index, count)
+        args.output = shard_path(args.output, index, count)
+        error_output = shard_path(error_output, index, count)
+        print(f"🧩 Shard {index}/{count}: {len(files_to_process)} arquivos -> {args.output}")
 
-    total = len(files_to_process)
-    print(f"🔎 Encontrados {total} arquivos para processar pela IA.")
+    journal_path = args.journal or journal_path_for(args.output)
+    if args.plan:
+        # Só lê o diário: abrir o ResultJournal sem --resume o apagaria
+        journal = None
+        done = scan_done(journal_path) if args.resume else set()
+    else:
+        journal = ResultJournal(journal_path, resume=args.resume)
+        done = journal.done
+    order = [os.path.basename(file) for file in files_to_process]
 
-    results = []
-    errors = []
+    cache = None
+    if args.plan:
+        # O plano só consulta o cache: não cria o arquivo nem marca uso
+        if not args.no_cache and os.path.exists(args.cache):
+            cache = ResponseCache(args.cache, max_age_days=args.cache_max_age_days,
+                                  read_only=True)
+    elif not args.no_cache:
+        cache = ResponseCache(args.cache, max_age_days=args.cache_max_age_days,
+                              max_mb=args.cache_max_mb)
 
-    processed = 0
-    for file_path in files_to_process:
-        processed += 1
-        rel_path = os.path.basename(file_path)
+    cascade = Cascade(models, threshold=args.cascade_threshold)
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
+    system_instruction = None
+    if args.context_cache:
+        system_instruction = SYSTEM_INSTRUCTION
+        if not args.batch and not args.cache_only and not args.plan:
+            # O CachedContent pertence ao projeto da chave: um por chave
+            for api_key in pool.keys:
+                api_key.cached_content = get_or_create_context_cache(
+                    api_key.client, models[0], SYSTEM_INSTRUCTION, ttl=args.context_cache_ttl
+                )
 
-        labels2 = labels_by_file.get(rel_path, [])
-        prompt = build_prompt(code, labels2)
+    hedger = None
+    if args.hedge_percentile > 0:
+        hedger = Hedger(args.hedge_percentile, args.hedge_budget)
 
-        print(f"\n[{processed}/{total}] 🔹 Chamando IA para: {rel_path} ...")
+    telemetry = Telemetry() if args.plan else Telemetry(args.metrics, args.prometheus)
+    latency_model = LatencyModel(args.latency_history)
+    requester = Requester(pool, concurrency=args.concurrency, timeout=args.timeout,
+                          cache=cache, cache_only=args.cache_only,
+                          journal=journal, system_instruction=system_instruction,
+                          structured=not args.no_structured_output,
+                          stream=args.stream, hedger=hedger, cascade=cascade,
+                          sast_lines=lines_by_file, telemetry=telemetry, minify=args.minify,
+                          chunk_tokens=args.chunk_tokens, sast_slice=args.slice,
+                          latency_model=latency_model, vote=args.vote,
+                          vote_temperature=args.vote_temperature)
 
-        success = False
-        last_error = None
-        raw = None
+    # Um pacote não pode passar do tamanho a partir do qual um arquivo é dividido
+    pack_tokens = 0 if args.batch else args.pack_tokens
+    if args.chunk_tokens:
+        pack_tokens = min(pack_tokens, args.chunk_tokens)
 
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                print(f"   🔁 Tentativa {attempt}/{MAX_RETRIES}")
+    manifest = None
+    fingerprints = {}
+    if args.incremental:
+        manifest = RunManifest(args.manifest or manifest_path_for(args.output))
+        version = requester.prompt_version(pack_tokens)
+        # As linhas do SAST decidem o recorte do --slice e a subida na cascata
+        use_lines = args.slice or cascade.enabled
+        for file in files_to_process:
+            name = os.path.basename(file)
+            fingerprints[name] = file_fingerprint(
+                file, labels_by_file[name], ",".join(models), version,
+                lines_by_file.get(name, set()) if use_lines else None
+            )
 
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=prompt,
-                    config=types.GenerateContentConfig(temperature=0.0)
-                )
+    if done:
+        files_to_process = [
+            file for file in files_to_process if os.path.basename(file) not in done
+        ]
+        print(f"⏩ Retomando: {len(done)} arquivos já concluídos em {journal_path}")
 
-                raw = response.text.strip()
+    if manifest is not None:
+        pending = []
+        for file in files_to_process:
+            entry = manifest.lookup(os.path.basename(file), fingerprints[os.path.basename(file)])
+            if entry is None:
+                pending.append(file)
+            elif journal is not None:
+                journal.result(entry)
+        reasons = ", ".join(f"{n} {reason}" for reason, n in sorted(manifest.reasons.items()))
+        print(f"♻️ Incremental: {len(files_to_process) - len(pending)} arquivos inalterados "
+              f"reaproveitados de {manifest.path}" + (f" (mudaram: {reasons})" if reasons else ""))
+        files_to_process = pending
 
-                if raw.startswith("```"):
-                    raw = raw.replace("```json", "").replace("```", "").strip()
+    saved_calls = 0
+    if not args.no_dedup:
+        unique, duplicates = group_duplicates(files_to_process, labels_by_file)
+        saved_calls = len(files_to_process) - len(unique)
+        requester.duplicates = duplicates
+        if saved_calls:
+            print(f"🧬 Deduplicação: {len(files_to_process)} arquivos em {len(unique)} grupos "
+                  f"de conteúdo idêntico")
+        files_to_process = unique
 
-                ai_result = json.loads(raw)
-                success = True
-                break
+    predicted = None
+    plan = None
+    cached_files = set()
+    if args.schedule == "lpt" and not args.batch and pack_tokens > 0:
+        # Os pacotes só existem depois da ordenação e o cache é por pacote, não
+        # por arquivo: o custo sai das requisições que o plano monta
+        files_to_process, _ = schedule(files_to_process, labels_by_file, latency_model,
+                                       models[0], args.chunk_tokens)
+        plan = build_plan(requester, files_to_process, labels_by_file, pack_tokens)
+        pending = [item for item in plan if not item["cached"]]
+        cached_files = ({name for item in plan for name in item["files"]}
+                        - {name for item in pending for name in item["files"]})
+        predicted = predicted_makespan(
+            [latency_model.predict(models[0], item["tokens"]) for item in pending],
+            args.concurrency)
+    elif args.schedule == "lpt" and not args.batch:
+        # Respostas que já estão no cache não ocupam os workers
+        cached_files = {
+            file for file in files_to_process
+            if requester.cached(file, labels_by_file.get(os.path.basename(file), []))
+        }
+        files_to_process, costs = schedule(files_to_process, labels_by_file, latency_model,
+                                           models[0], args.chunk_tokens, cached_files)
+        predicted = predicted_makespan(costs, args.concurrency)
 
-            except json.JSONDecodeError:
-                last_error = "Invalid JSON"
-                print("   ⚠️ JSON inválido retornado pela IA")
+    if args.plan:
+        if plan is None:
+            plan = build_plan(requester, files_to_process, labels_by_file, pack_tokens)
+        if args.plan_count_tokens:
+            asyncio.run(count_tokens(pool.client, models[0], plan, args.concurrency,
+                                     system_instruction))
+        print_plan(plan, latency_model, models[0], args.concurrency, max(1, len(api_keys)),
+                   rpm=args.rpm, tpm=args.tpm, batch=args.batch, cascade=cascade.enabled,
+                   counted=args.plan_count_tokens)
+        if cache is not None:
+            cache.close()
+        return
 
-            except Exception as e:
-                last_error = str(e)
-                print(f"   ⚠️ Erro de requisição: {last_error}")
+    for file in files_to_process:
+        print(os.path.basename(file))
 
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY)
+    total = len(files_to_process)
+    print(f"🔎 Encontrados {total} arquivos para processar pela IA.")
+    print(f"⚙️ Concorrência: {args.concurrency} | Timeout: {args.timeout}s")
+    if args.rpm or args.tpm:
+        print(f"⏱️ Limite de cota: {args.rpm or '∞'} RPM | {args.tpm or '∞'} TPM por chave")
+    if len(pool) > 1:
+        print(f"🔑 Pool com {len(pool)} chaves de API")
 
-        # =============================
-        # Falha definitiva
-        # =============================
-        if not success:
-            print(f"❌ Falha definitiva em {rel_path}\n")
-            errors.append({
-                "filename": rel_path,
-                "error": last_error,
-                "raw": raw
-            })
-            continue
+    makespan = None
+    started = time.monotonic()
+    try:
+        if args.batch:
+            requester.run_batch(files_to_process, labels_by_file, args.batch_file)
+        else:
+            asyncio.run(requester.run(files_to_process, labels_by_file, args.concurrency,
+                                      pack_tokens=pack_tokens))
+            makespan = time.monotonic() - started
+    except KeyboardInterrupt:
+        print("\n🛑 Interrompido! Use --resume para continuar de onde parou.")
+    finally:
+        journal.close()
+        telemetry.close()
+        latency_model.save()
 
-        # =============================
-        # Sucesso
-        # =============================
-        results.append({
-            "filename": rel_path,
-            "ai_predictions": ai_result
-        })
+    if manifest is not None:
+        manifest.update_from_journal(journal_path, fingerprints)
+        manifest.save()
 
-        print(f"✔️ Processado com sucesso: {rel_path}\n")
+    if cache is not None:
+        evicted = cache.evict()
+        print(f"💾 Cache: {cache.hits} acertos, {cache.misses} faltas, {evicted} entradas removidas")
+        cache.close()
 
     # =============================
     # Salva resultados
     # =============================
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    done, failed = compact(journal_path, order, args.output, error_output)
 
-    print(f"\n🎯 Concluído! {processed}/{total} arquivos processados.")
+    print(f"\n🎯 Concluído! {done + failed}/{len(order)} arquivos processados.")
+    if requester.tokens_saved:
+        saved = sum(requester.tokens_saved.values())
+        print(f"✂️ Pré-processamento: ~{saved} tokens de entrada economizados "
+              f"em {len(requester.tokens_saved)} arquivos")
+    if saved_calls:
+        print(f"🧬 Deduplicação: {saved_calls} chamadas economizadas "
+              f"({saved_calls / (total + saved_calls):.0%} dos arquivos eram cópias)")
+    if pool.enabled:
+        print(f"⏱️ Tempo total aguardando cota: {pool.total_wait:.1f}s")
+    if len(pool) > 1:
+        pool.report()
+    if cascade.enabled:
+        cascade.report()
+    if hedger is not None:
+        print(f"🏇 Hedging: {hedger.hedges} cópias enviadas em {hedger.calls} chamadas, "
+              f"{hedger.wins} venceram a original")
+    if requester.stream_timings:
+        timings = requester.stream_timings
+        ttfb = sorted(t["ttfb"] for t in timings if t["ttfb"] is not None)
+        ttff = sorted(t["first_finding"] for t in timings if t["first_finding"] is not None)
+        if ttfb:
+            print(f"📶 Mediana do 1º byte: {ttfb[len(ttfb) // 2]:.2f}s ({len(ttfb)} respostas)")
+        if ttff:
+            print(f"📶 Mediana do 1º achado: {ttff[len(ttff) // 2]:.2f}s")
+    telemetry.summary()
+    if requester.singleflight.shared:
+        print(f"🪂 Singleflight: {requester.singleflight.shared} pedidos idênticos aproveitaram "
+              f"uma chamada já em voo ({requester.singleflight.calls} chamadas feitas)")
+    if predicted is not None and makespan is not None:
+        print(f"🗓️ Makespan previsto {predicted:.1f}s | real {makespan:.1f}s "
+              f"com {args.concurrency} workers (ordem do mais longo para o mais curto"
+              + (f"; {len(cached_files)} arquivos já em cache" if cached_files else "") + ")")
 
-    if errors:
-        print(f"⚠️ Ocorreram {len(errors)} erros. Veja: erro_ia_log.json")
-        with open("erro_ia_log.json", "w", encoding="utf-8") as ef:
-            json.dump(errors, ef, indent=2, ensure_ascii=False)
+    if failed:
+        print(f"⚠️ Ocorreram {failed} erros. Veja: {error_output}")
     else:
         print("✅ Nenhum erro detectado durante as requisições à IA.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
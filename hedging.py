@@ -0,0 +1,96 @@
+import asyncio
+import bisect
+import collections
+import time
+
+MIN_SAMPLES = 10
+WINDOW = 200
+
+
+class Hedger:
+    """
+    Dispara uma cópia da requisição quando a original passa do percentil
+    `percentile` das latências observadas; vale a primeira resposta válida e
+    a outra é cancelada. `budget` limita a fração de chamadas que podem ser
+    duplicadas.
+    """
+
+    def __init__(self, percentile: float, budget: float):
+        self.percentile = percentile
+        self.budget = budget
+        self.window = collections.deque(maxlen=WINDOW)
+        self.sorted = []
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def record(self, latency: float):
+        if len(self.window) == self.window.maxlen:
+            old = self.window[0]
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+        self.window.append(latency)
+        bisect.insort(self.sorted, latency)
+
+    def threshold(self):
+        if len(self.sorted) < MIN_SAMPLES:
+            return None
+        index = min(len(self.sorted) - 1, int(len(self.sorted) * self.percentile / 100))
+        return self.sorted[index]
+
+    def allow(self) -> bool:
+        if self.hedges + 1 > self.budget * self.calls:
+            return False
+        self.hedges += 1
+        return True
+
+    async def run(self, factory):
+        """
+        `factory(dispatched)` cria uma nova tentativa (corrotina) que devolve
+        um resultado válido ou levanta exceção, e chama `dispatched()` quando
+        a requisição sai de fato, depois de esperar pela cota. O tempo só
+        conta a partir daí: fila de cota não é latência do servidor.
+        """
+        self.calls += 1
+        sent = asyncio.Event()
+        started = None
+
+        def dispatched():
+            nonlocal started
+            started = time.monotonic()
+            sent.set()
+
+        primary = asyncio.ensure_future(factory(dispatched))
+        tasks = {primary}
+
+        try:
+            delay = self.threshold()
+            if delay is not None:
+                while not primary.done():
+                    if started is None:
+                        waiter = asyncio.ensure_future(sent.wait())
+                        await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                        waiter.cancel()
+                        continue
+                    # Uma troca de chave despacha de novo e reinicia o relógio
+                    remaining = started + delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    await asyncio.wait(tasks, timeout=remaining)
+                if not primary.done() and self.allow():
+                    tasks.add(asyncio.ensure_future(factory(lambda: None)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.wins += 1
+                        if started is not None:
+                            self.record(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import re
+import time
+
+from rate_limiter import RateLimiter
+
+API_KEYS_ENV = "GEMINI_API_KEYS"
+KEY_SEPARATOR_RE = re.compile(r"[\s,]+")
+
+
+def load_api_keys(api_key=None, keys_file=None) -> list[str]:
+    """
+    Junta as chaves de --api-key, de um arquivo (uma por linha, # comenta)
+    e da variável GEMINI_API_KEYS (separadas por vírgula ou espaço), sem
+    repetir e na ordem em que aparecem.
+    """
+    keys = [api_key] if api_key else []
+
+    if keys_file:
+        with open(keys_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    keys.append(line)
+
+    keys += [key for key in KEY_SEPARATOR_RE.split(os.environ.get(API_KEYS_ENV, "")) if key]
+    return list(dict.fromkeys(keys))
+
+
+class ApiKey:
+    """
+    Uma chave do pool: cliente próprio, limitador com a cota do projeto
+    dela e estado de saúde (fora do pool ou esfriando depois de um 429).
+    """
+
+    def __init__(self, key: str, client, limiter: RateLimiter):
+        self.key = key
+        self.client = client
+        self.limiter = limiter
+        self.cached_content = None
+        self.disabled = None
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+
+    @property
+    def label(self) -> str:
+        return f"...{self.key[-4:]}"
+
+
+class KeyPool:
+    """
+    Distribui as requisições entre várias chaves de API. Cada requisição vai
+    para a chave com mais folga de cota (e, empatando, com menos requisições
+    em voo); chaves recusadas pela API saem do pool e chaves que tomaram 429
+    ficam de lado até o tempo sugerido pelo servidor.
+    """
+
+    def __init__(self, keys: list[str], make_client, rpm=None, tpm=None):
+        self.keys = [ApiKey(key, make_client(key), RateLimiter(rpm=rpm, tpm=tpm)) for key in keys]
+        self.cooldown_wait = 0.0
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def active(self) -> list[ApiKey]:
+        return [key for key in self.keys if key.disabled is None]
+
+    @property
+    def client(self):
+        # Para as operações que não passam pelo pool (batch, cache de contexto)
+        active = self.active
+        return (active or self.keys)[0].client
+
+    @property
+    def enabled(self) -> bool:
+        return any(key.limiter.enabled for key in self.keys)
+
+    @property
+    def total_wait(self) -> float:
+        return sum(key.limiter.total_wait for key in self.keys)
+
+    def ready(self) -> list[ApiKey]:
+        now = time.monotonic()
+        return [key for key in self.active if key.cooldown_until <= now]
+
+    async def pick(self, tokens: int) -> ApiKey:
+        while True:
+            active = self.active
+            if not active:
+                raise RuntimeError("Nenhuma chave de API válida no pool")
+
+            candidates = self.ready()
+            if candidates:
+                break
+            # Todas esfriando depois de um 429: espera a primeira voltar em vez
+            # de mandar para uma chave que o servidor acabou de dizer que está sem cota
+            wait = min(key.cooldown_until for key in active) - time.monotonic()
+            self.cooldown_wait += max(wait, 0.0)
+            await asyncio.sleep(max(wait, 0.0))
+
+        chosen = max(candidates, key=lambda key: (key.limiter.headroom(tokens), -key.in_flight))
+        chosen.calls += 1
+        return chosen
+
+    def disable(self, key: ApiKey, reason: str):
+        if key.disabled is None:
+            key.disabled = reason
+            print(f"🔑 Chave {key.label} removida do pool: {reason}")
+
+    def cool_down(self, key: ApiKey, delay: float):
+        key.rate_limited += 1
+        key.cooldown_until = max(key.cooldown_until, time.monotonic() + delay)
+
+    def report(self):
+        print(f"🔑 Pool de chaves: {len(self.active)}/{len(self.keys)} ativas, "
+              f"{self.cooldown_wait:.1f}s de espera somada com todas esfriando depois de 429")
+        for key in self.keys:
+            status = f"removida ({key.disabled})" if key.disabled else "ativa"
+            print(f"   {key.label}: {key.calls} chamadas, {key.rate_limited} com 429, "
+                  f"{key.limiter.total_wait:.1f}s aguardando cota, {status}")
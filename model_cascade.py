@@ -0,0 +1,74 @@
+from response_parsing import LINE_KEY
+
+DEFAULT_THRESHOLD = 0.5
+
+
+class Cascade:
+    """
+    Ordem de modelos do mais barato para o mais caro. Um arquivo só sobe
+    para o próximo nível quando a resposta falha, vem vazia apesar de o SAST
+    ter achado algo, ou discorda das linhas do SAST além de `threshold`.
+    """
+
+    def __init__(self, models: list[str], threshold=DEFAULT_THRESHOLD):
+        self.models = models
+        self.threshold = threshold
+        self.resolved = [0] * len(models)
+        self.escalations = [0] * len(models)
+        self.stats = {model: {"calls": 0, "tokens": 0, "latency": 0.0} for model in models}
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.models) > 1
+
+    def observe(self, model: str, latency: float, tokens: int):
+        stats = self.stats.setdefault(model, {"calls": 0, "tokens": 0, "latency": 0.0})
+        stats["calls"] += 1
+        stats["tokens"] += tokens
+        stats["latency"] += latency
+
+    def escalation_reason(self, predictions, labels2: list[str], sast_lines):
+        """
+        Devolve o motivo para subir de nível, ou None se a resposta basta.
+        """
+        if predictions is None:
+            return "resposta inválida"
+        if not predictions and labels2:
+            return "resposta vazia com labels do SAST"
+
+        if sast_lines:
+            predicted = {p[LINE_KEY] for p in predictions}
+            disagreement = 1 - len(predicted & sast_lines) / len(sast_lines)
+            if disagreement > self.threshold:
+                return f"discorda de {disagreement:.0%} das linhas do SAST"
+
+        return None
+
+    def report(self):
+        top = self.models[-1]
+        top_stats = self.stats[top]
+        total = sum(self.resolved)
+
+        print("🪜 Cascata de modelos:")
+        for tier, model in enumerate(self.models):
+            stats = self.stats[model]
+            mean = stats["latency"] / stats["calls"] if stats["calls"] else 0.0
+            print(f"   {tier + 1}. {model}: {self.resolved[tier]} arquivos resolvidos, "
+                  f"{self.escalations[tier]} escalados | {stats['calls']} chamadas, "
+                  f"{stats['tokens']} tokens, latência média {mean:.2f}s")
+
+        if not total:
+            return
+
+        # Comparação com uma execução só com o modelo mais caro: cada arquivo
+        # resolvido abaixo dele seria uma chamada a mais no topo.
+        avoided = total - self.resolved[-1]
+        print(f"   💡 {avoided}/{total} arquivos ({avoided / total:.0%}) não precisaram de {top}")
+
+        if top_stats["calls"]:
+            top_latency = top_stats["latency"] / top_stats["calls"]
+            top_tokens = top_stats["tokens"] / top_stats["calls"]
+            spent_latency = sum(s["latency"] for s in self.stats.values())
+            spent_tokens = sum(s["tokens"] for s in self.stats.values())
+            print(f"   💡 Estimativa só com {top}: {top_latency * total:.1f}s de latência somada e "
+                  f"{top_tokens * total:.0f} tokens (cascata: {spent_latency:.1f}s e {spent_tokens} tokens)")
@@ -0,0 +1,62 @@
+import os
+from rate_limiter import CHARS_PER_TOKEN
+
+# Limita o tamanho da resposta de um pacote: com muitos arquivos o modelo
+# tende a esquecer algum deles ou misturar as linhas entre arquivos.
+MAX_PACK_FILES = 8
+
+# Tokens aproximados das instruções fixas do prompt empacotado
+PACK_OVERHEAD_TOKENS = 120
+
+
+def file_tokens(file_path: str, labels2: list[str]) -> int:
+    # Estimativa pelo tamanho em disco, sem ler o conteúdo
+    return os.path.getsize(file_path) // CHARS_PER_TOKEN + 10 * (len(labels2) + 1)
+
+
+def build_packed_prompt(files: list[tuple[str, str, list[str]]]) -> str:
+    parts = [
+        "For each of the following python files, which are delimited with triple "
+        "backticks and preceded by their filename, tell which of the vulnerabilities "
+        "from that file's list of vulnerabilities exist in its code. also give the "
+        "number of the line of the vulnerability in that file.\n\n"
+    ]
+
+    for filename, code, labels2 in files:
+        parts.append(
+            f"File: {filename}\n'''\n{code}\n'''\n"
+            f"List of vulnerabilities for {filename}:\n" + ", ".join(labels2) + "\n\n"
+        )
+
+    parts.append(
+        "Format your response as a JSON object whose keys are the filenames above and whose "
+        "values are lists of JSON objects with \"label\" and \"line of Code\" as the keys for "
+        "each element. Line numbers are relative to the start of each file. Only answer with JSON."
+    )
+    return "".join(parts)
+
+
+def pack_files(files_to_process: list[str], labels_by_file: dict, budget: int):
+    """
+    Agrupa arquivos consecutivos em pacotes de até `budget` tokens estimados
+    (pelo tamanho em disco, sem ler o conteúdo). Gera listas de
+    (índice, caminho, labels); arquivos que sozinhos estouram o orçamento
+    saem em pacotes de um só arquivo.
+    """
+    pack = []
+    used = PACK_OVERHEAD_TOKENS
+
+    for index, file_path in enumerate(files_to_process, start=1):
+        labels2 = labels_by_file.get(os.path.basename(file_path), [])
+        cost = file_tokens(file_path, labels2)
+
+        if pack and (used + cost > budget or len(pack) >= MAX_PACK_FILES):
+            yield pack
+            pack = []
+            used = PACK_OVERHEAD_TOKENS
+
+        pack.append((index, file_path, labels2))
+        used += cost
+
+    if pack:
+        yield pack
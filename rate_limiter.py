@@ -0,0 +1,133 @@
+import asyncio
+import collections
+import time
+
+# Margem de segurança: usamos só parte da cota para não bater no limite
+# exato (o servidor conta a janela de forma um pouco diferente da nossa).
+DEFAULT_SAFETY = 0.9
+
+# Aproximação usada pela própria documentação do Gemini: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+# A cota do Gemini vale por minuto. Um consumo só sai da janela um pouco
+# depois dos 60s: o servidor registra a chamada quando ela chega, não quando
+# a liberamos, e sem a folga a próxima leva chegaria antes da anterior expirar.
+WINDOW = 60.0
+WINDOW_MARGIN = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class SlidingWindow:
+    """
+    Cota por minuto numa janela deslizante de 60 segundos: guarda o instante
+    e a quantidade de cada consumo e só libera um pedido quando a soma dos
+    últimos 60 segundos mais ele cabe em `capacity`. Diferente de um balde
+    que começa cheio e ainda recarrega, nunca passa da cota em janela nenhuma.
+    """
+
+    def __init__(self, per_minute: float, safety: float = DEFAULT_SAFETY):
+        self.capacity = per_minute * safety
+        self.events = collections.deque()
+        self.used = 0.0
+
+    def _expire(self, now: float):
+        while self.events and self.events[0][0] <= now - WINDOW - WINDOW_MARGIN:
+            self.used -= self.events.popleft()[1]
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._expire(now)
+        # Um pedido maior que a cota inteira nunca caberia; limitamos à capacidade
+        excess = self.used + min(amount, self.capacity) - self.capacity
+        if excess <= 0:
+            return 0.0
+
+        # Espera até saírem da janela consumos suficientes para caber
+        freed = 0.0
+        for at, spent in self.events:
+            freed += spent
+            if freed >= excess:
+                return at + WINDOW + WINDOW_MARGIN - now
+        return WINDOW + WINDOW_MARGIN
+
+    def headroom(self, amount: float, now: float) -> float:
+        # Fração da cota que sobra depois do pedido (negativa = teria que esperar)
+        self._expire(now)
+        return (self.capacity - self.used - min(amount, self.capacity)) / self.capacity
+
+    def consume(self, amount: float, now: float):
+        amount = min(amount, self.capacity)
+        self.events.append([now, amount])
+        self.used += amount
+
+    def adjust(self, delta: float, now: float):
+        # delta > 0 significa que gastamos mais do que o estimado. A correção
+        # vai no consumo mais recente: sai da janela mais tarde, a favor da cota
+        self._expire(now)
+        if not self.events:
+            return
+        last = self.events[-1]
+        delta = max(delta, -last[1])
+        last[1] += delta
+        self.used += delta
+
+
+class RateLimiter:
+    """
+    Limita as chamadas por requisições/minuto (RPM) e tokens/minuto (TPM).
+    Um limite <= 0 ou None desativa aquela dimensão.
+    """
+
+    def __init__(self, rpm=None, tpm=None, safety: float = DEFAULT_SAFETY):
+        self.requests = SlidingWindow(rpm, safety) if rpm else None
+        self.tokens = SlidingWindow(tpm, safety) if tpm else None
+        self._lock = asyncio.Lock()
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def headroom(self, tokens: int) -> float:
+        """
+        Folga da cota se este pedido fosse feito agora: a menor fração que
+        sobraria entre RPM e TPM (1.0 sem limite).
+        """
+        now = time.monotonic()
+        fractions = [1.0]
+        if self.requests:
+            fractions.append(self.requests.headroom(1, now))
+        if self.tokens:
+            fractions.append(self.tokens.headroom(tokens, now))
+        return min(fractions)
+
+    async def acquire(self, tokens: int):
+        if not self.enabled:
+            return
+
+        # O lock garante ordem FIFO: quem chegou primeiro é agendado primeiro
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = 0.0
+                if self.requests:
+                    wait = max(wait, self.requests.wait_time(1, now))
+                if self.tokens:
+                    wait = max(wait, self.tokens.wait_time(tokens, now))
+
+                if wait <= 0:
+                    if self.requests:
+                        self.requests.consume(1, now)
+                    if self.tokens:
+                        self.tokens.consume(tokens, now)
+                    return
+
+                self.total_wait += wait
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual):
+        # Corrige a janela de TPM com a contagem real devolvida pela API
+        if self.tokens and actual:
+            self.tokens.adjust(actual - estimated, time.monotonic())
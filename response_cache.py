@@ -0,0 +1,152 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = ".gemini_cache.sqlite"
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_MB = 200
+
+# Cada commit do SQLite é um fsync, feito dentro do loop do asyncio: as
+# gravações ficam em memória e vão juntas a cada COMMIT_EVERY respostas
+# ou COMMIT_INTERVAL segundos (e no evict()/close()). Perder as últimas num
+# crash só custa refazer essas chamadas; o diário tem os resultados.
+COMMIT_EVERY = 50
+COMMIT_INTERVAL = 2.0
+
+
+def cache_key(model: str, config: dict, prompt: str) -> str:
+    """
+    Hash do que determina a resposta: modelo, configuração de geração e o
+    prompt completo. Qualquer mudança em um deles gera uma chave nova.
+    """
+    payload = json.dumps(
+        {"model": model, "config": config, "prompt": prompt},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache persistente (SQLite) das respostas do Gemini, endereçado por conteúdo.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 max_mb=DEFAULT_MAX_MB, read_only=False):
+        self.path = path
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.hits = 0
+        self.misses = 0
+        self.pending = {}
+        self.touched = {}
+        self.last_commit = time.monotonic()
+
+        if read_only:
+            # Só consultas (--plan): o arquivo precisa existir e nunca é alterado
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " raw TEXT NOT NULL,"
+            " parsed TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _row(self, key: str):
+        # (raw, parsed, created_at), olhando antes as gravações ainda não commitadas
+        pending = self.pending.get(key)
+        if pending is not None:
+            return pending[2], pending[3], pending[5]
+        return self.conn.execute(
+            "SELECT raw, parsed, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+    def get(self, key: str):
+        row = self._row(key)
+
+        now = time.time()
+        if row is None or (self.max_age and now - row[2] > self.max_age):
+            self.misses += 1
+            return None
+
+        # O last_used só importa para o evict(); vai junto com o próximo commit
+        self.touched[key] = now
+        self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def contains(self, key: str) -> bool:
+        # Como get(), mas sem contar acerto/falta nem marcar o uso
+        row = self._row(key)
+        return row is not None and not (self.max_age and time.time() - row[2] > self.max_age)
+
+    def put(self, key: str, model: str, raw: str, parsed):
+        parsed_json = json.dumps(parsed, ensure_ascii=False)
+        now = time.time()
+        self.pending[key] = (key, model, raw, parsed_json, len(raw) + len(parsed_json), now, now)
+        self.touched.pop(key, None)
+
+        if (len(self.pending) >= COMMIT_EVERY
+                or time.monotonic() - self.last_commit >= COMMIT_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        # Uma transação curta por lote: nada fica travando o arquivo entre
+        # commits para outras execuções (ex: shards) que usam o mesmo cache
+        if self.pending or self.touched:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                list(self.pending.values())
+            )
+            self.conn.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self.touched.items()]
+            )
+            self.conn.commit()
+            self.pending.clear()
+            self.touched.clear()
+        self.last_commit = time.monotonic()
+
+    def evict(self) -> int:
+        """
+        Remove entradas mais velhas que max_age e, se o cache passar de
+        max_bytes, as menos usadas recentemente até caber no limite.
+        """
+        self.flush()
+        removed = 0
+
+        if self.max_age:
+            cur = self.conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+            )
+            removed += cur.rowcount
+
+        if self.max_bytes:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self.conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used ASC"
+                ).fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                removed += len(stale)
+
+        self.conn.commit()
+        return removed
+
+    def close(self):
+        self.flush()
+        self.conn.close()
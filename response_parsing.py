@@ -0,0 +1,131 @@
+import json
+import re
+
+LINE_KEY = "line of Code"
+AGREEMENT_KEY = "agreement"
+
+# Fração dos candidatos que precisa concordar com um achado no modo de votação
+VOTE_MAJORITY = 0.5
+
+# Esquema da resposta esperada: [{"label": ..., "line of Code": ...}, ...]
+PREDICTIONS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "label": {"type": "string"},
+            LINE_KEY: {"type": "integer"}
+        },
+        "required": ["label", LINE_KEY]
+    }
+}
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+
+
+def repair_json(text: str):
+    """
+    Tenta recuperar um JSON mal formado antes de gastar uma nova tentativa:
+    bloco markdown no meio do texto, texto antes/depois do JSON e vírgulas
+    sobrando no fim de listas/objetos.
+    """
+    fenced = FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    starts = [i for i in (text.find("["), text.find("{")) if i != -1]
+    if not starts:
+        raise json.JSONDecodeError("No JSON found", text, 0)
+    start = min(starts)
+    end = max(text.rfind("]"), text.rfind("}"))
+    candidate = TRAILING_COMMA_RE.sub(r"\1", text[start:end + 1])
+
+    return json.loads(candidate)
+
+
+def validate_predictions(data) -> list:
+    """
+    Confere se a resposta segue PREDICTIONS_SCHEMA e normaliza os desvios
+    mais comuns (objeto único, lista dentro de um objeto, linha como texto).
+    Levanta ValueError se não for possível.
+    """
+    if isinstance(data, dict):
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if "label" in data:
+            data = [data]
+        elif len(lists) == 1:
+            data = lists[0]
+
+    if not isinstance(data, list):
+        raise ValueError("Response is not a list")
+
+    predictions = []
+    for item in data:
+        if not isinstance(item, dict) or not isinstance(item.get("label"), str):
+            raise ValueError(f"Invalid prediction: {item!r}")
+
+        line = item.get(LINE_KEY)
+        if isinstance(line, str) and line.strip().isdigit():
+            line = int(line)
+        if not isinstance(line, int) or isinstance(line, bool):
+            raise ValueError(f"Invalid line of Code: {line!r}")
+
+        predictions.append({"label": item["label"], LINE_KEY: line})
+
+    return predictions
+
+
+def validate_packed(data) -> dict:
+    # Cada parte é validada separadamente na hora de separar o pacote
+    if not isinstance(data, dict):
+        raise ValueError("Packed response is not an object")
+    return data
+
+
+def vote_predictions(texts: list[str], validate=validate_predictions):
+    """
+    Autoconsistência: analisa cada candidato da mesma chamada e mantém os
+    pares (label, linha) apontados pela maioria dos candidatos válidos, com
+    a fração deles que concorda em "agreement". Candidatos inválidos não
+    votam; se nenhum for válido, levanta o erro do primeiro.
+    """
+    raws = []
+    votes = {}
+    first_error = None
+
+    for text in texts:
+        try:
+            raw, predictions = parse_response(text, validate)
+        except ValueError as e:
+            # json.JSONDecodeError também é um ValueError
+            first_error = first_error or e
+            continue
+        raws.append(raw)
+        for pair in {(item["label"], item[LINE_KEY]) for item in predictions}:
+            votes[pair] = votes.get(pair, 0) + 1
+
+    if not raws:
+        raise first_error or ValueError("No candidates in response")
+
+    valid = len(raws)
+    predictions = [
+        {"label": label, LINE_KEY: line, AGREEMENT_KEY: round(count / valid, 3)}
+        for (label, line), count in sorted(votes.items(), key=lambda kv: (-kv[1], kv[0]))
+        if count / valid > VOTE_MAJORITY
+    ]
+    return json.dumps(raws, ensure_ascii=False), predictions
+
+
+def parse_response(text: str, validate=validate_predictions):
+    raw = text.strip()
+
+    if raw.startswith("```"):
+        raw = raw.replace("```json", "").replace("```", "").strip()
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        data = repair_json(raw)
+
+    return raw, validate(data)
@@ -0,0 +1,128 @@
+import json
+import os
+import textwrap
+import time
+
+DEFAULT_FSYNC_EVERY = 20
+DEFAULT_FSYNC_INTERVAL = 2.0
+
+
+def journal_path_for(output: str) -> str:
+    return output + ".journal.jsonl"
+
+
+class ResultJournal:
+    """
+    Diário JSONL com um registro por arquivo concluído. Cada linha é
+    {"status": "ok" | "error", "entry": {...}}; se um arquivo aparece mais de
+    uma vez (ex: erro seguido de sucesso no --resume), vale o último registro.
+
+    O fsync é feito em lotes (a cada `fsync_every` registros ou
+    `fsync_interval` segundos) para não pagar um fsync por arquivo.
+    """
+
+    def __init__(self, path: str, resume=False, fsync_every=DEFAULT_FSYNC_EVERY,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.done = scan_done(path) if resume else set()
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self.file.tell() > 0:
+            # Garante que um registro truncado por crash não grude no próximo
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def append(self, status: str, entry: dict):
+        self.file.write(json.dumps({"status": status, "entry": entry}, ensure_ascii=False) + "\n")
+        self.pending += 1
+
+        if (self.pending >= self.fsync_every
+                or time.monotonic() - self.last_sync >= self.fsync_interval):
+            self.sync()
+
+    def result(self, entry: dict):
+        self.append("ok", entry)
+
+    def error(self, entry: dict):
+        self.append("error", entry)
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+def iter_records(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha truncada por um crash no meio da escrita
+                continue
+
+
+def scan_done(path: str) -> set:
+    # Arquivos cujo último registro no diário é de sucesso
+    status = {}
+    if os.path.exists(path):
+        for record in iter_records(path):
+            status[record["entry"]["filename"]] = record["status"]
+    return {filename for filename, st in status.items() if st == "ok"}
+
+
+def _write_array(path: str, journal: str, offsets: list[int]):
+    with open(journal, "rb") as src, open(path, "w", encoding="utf-8") as out:
+        if not offsets:
+            out.write("[]")
+            return
+
+        out.write("[\n")
+        for i, offset in enumerate(offsets):
+            src.seek(offset)
+            entry = json.loads(src.readline())["entry"]
+            out.write(textwrap.indent(json.dumps(entry, indent=2, ensure_ascii=False), "  "))
+            out.write(",\n" if i < len(offsets) - 1 else "\n")
+        out.write("]")
+
+
+def compact(journal: str, order: list[str], output: str, error_output: str):
+    """
+    Gera o JSON final a partir do diário, na ordem de `order` (arquivos que
+    só existem no diário vêm depois, em ordem alfabética). Só os offsets de
+    cada linha ficam em memória; os registros são relidos um a um.
+    """
+    latest = {}
+    with open(journal, "rb") as f:
+        offset = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if record is not None:
+                latest[record["entry"]["filename"]] = (record["status"], offset)
+            offset += len(line)
+
+    position = {filename: i for i, filename in enumerate(order)}
+    ordered = sorted(latest, key=lambda name: (position.get(name, len(order)), name))
+
+    result_offsets = [latest[name][1] for name in ordered if latest[name][0] == "ok"]
+    error_offsets = [latest[name][1] for name in ordered if latest[name][0] == "error"]
+
+    _write_array(output, journal, result_offsets)
+    if error_offsets:
+        _write_array(error_output, journal, error_offsets)
+
+    return len(result_offsets), len(error_offsets)
@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import re
+import time
+
+# httpx e google.genai são importados dentro das funções: só fazem falta
+# depois de uma chamada à API, e carregar o SDK leva ~0,4s (o --plan não usa).
+
+BASE_DELAY = 5
+MAX_DELAY = 120
+
+# Erros que não adianta repetir: requisição inválida, chave inválida ou sem
+# permissão, modelo inexistente.
+FATAL_STATUS = {400, 401, 403, 404}
+AUTH_STATUS = {401, 403}
+
+DURATION_RE = re.compile(r"^\s*([\d.]+)s\s*$")
+
+
+class RetryLater(Exception):
+    """
+    Falha temporária: a unidade de trabalho deve voltar para a fila de
+    adiados e ser tentada de novo depois de `delay` segundos.
+    """
+
+    def __init__(self, delay: float, error: str):
+        super().__init__(error)
+        self.delay = delay
+        self.error = error
+
+
+def is_retryable(exc: Exception) -> bool:
+    import httpx
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code not in FATAL_STATUS
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError, ValueError)):
+        # ValueError cobre JSON inválido e resposta fora do esquema
+        return True
+    return False
+
+
+def is_auth_error(exc: Exception) -> bool:
+    # Chave inválida, revogada ou sem permissão; o Gemini responde 400 com
+    # reason API_KEY_INVALID para chave inexistente
+    from google.genai import errors
+
+    if not isinstance(exc, errors.APIError):
+        return False
+    if exc.code in AUTH_STATUS:
+        return True
+    return exc.code == 400 and "API_KEY_INVALID" in json.dumps(exc.details, default=str)
+
+
+def is_cached_content_error(exc: Exception) -> bool:
+    # CachedContent expirado ou apagado: a API recusa com 4xx citando o cache
+    # (ex: 403 "CachedContent not found (or permission denied)"), o que não
+    # é culpa da chave nem da requisição
+    from google.genai import errors
+
+    if not isinstance(exc, errors.APIError) or exc.code not in FATAL_STATUS:
+        return False
+    return "cachedcontent" in str(exc).lower().replace(" ", "").replace("_", "")
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    from google.genai import errors
+
+    return isinstance(exc, errors.APIError) and exc.code == 429
+
+
+def retry_after_hint(exc: Exception):
+    """
+    Lê o tempo de espera sugerido pelo servidor: o header Retry-After ou o
+    RetryInfo.retryDelay ("37s") que o Gemini manda no corpo dos 429.
+    """
+    from google.genai import errors
+
+    if not isinstance(exc, errors.APIError):
+        return None
+
+    headers = getattr(exc.response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    details = exc.details
+    if isinstance(details, dict):
+        details = details.get("error", details)
+        details = details.get("details", []) if isinstance(details, dict) else []
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            match = DURATION_RE.match(str(detail["retryDelay"]))
+            if match:
+                return float(match.group(1))
+
+    return None
+
+
+def backoff_delay(attempt: int, hint=None) -> float:
+    # "Full jitter": espera aleatória entre 0 e o teto exponencial, para que
+    # vários workers que falharam juntos não voltem todos no mesmo instante.
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1)))
+    if hint is not None:
+        delay = max(delay, hint)
+    return delay
+
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, json.JSONDecodeError):
+        return "Invalid JSON"
+    if isinstance(exc, ValueError):
+        return f"Invalid schema: {exc}"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "Timeout"
+    return str(exc)
+
+
+class DeferredQueue:
+    """
+    Fila de unidades de trabalho adiadas, ordenada pelo instante em que cada
+    uma pode ser tentada de novo.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item, attempt: int, delay: float):
+        heapq.heappush(self.heap, (time.monotonic() + delay, next(self.counter), item, attempt))
+
+    async def pop(self):
+        ready_at, _, item, attempt = heapq.heappop(self.heap)
+        wait = ready_at - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return item, attempt
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+
+from result_journal import iter_records
+
+MANIFEST_VERSION = 1
+FINGERPRINT_FIELDS = ("content", "labels", "lines", "model", "prompt_version")
+
+
+def manifest_path_for(output: str) -> str:
+    return output + ".manifest.json"
+
+
+def file_fingerprint(path: str, labels: list[str], model: str, prompt_version: str,
+                     lines=None) -> dict:
+    """
+    O que determina o resultado de um arquivo: hash do conteúdo, labels do
+    SAST (na ordem em que entram no prompt), linhas apontadas pelo SAST
+    (quando usadas: --slice ou cascata), modelo(s) e versão do prompt.
+    """
+    with open(path, "rb") as f:
+        content = hashlib.sha256(f.read()).hexdigest()
+    return {
+        "content": content,
+        "labels": list(labels),
+        "lines": sorted(lines) if lines is not None else None,
+        "model": model,
+        "prompt_version": prompt_version
+    }
+
+
+class RunManifest:
+    """
+    Manifesto JSON com a impressão digital e o último resultado válido de cada
+    arquivo. Numa nova execução só vão para a IA os arquivos cuja impressão
+    digital mudou; os demais reaproveitam o resultado guardado.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        self.reasons = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+
+    def lookup(self, filename: str, fingerprint: dict):
+        """
+        Devolve o resultado guardado se nada mudou; senão anota o motivo
+        (para o resumo) e devolve None.
+        """
+        stored = self.files.get(filename)
+        if stored is None:
+            reason = "novo"
+        else:
+            changed = [field for field in FINGERPRINT_FIELDS
+                       if stored["fingerprint"].get(field) != fingerprint[field]]
+            if not changed:
+                return stored["entry"]
+            reason = changed[0]
+
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return None
+
+    def update_from_journal(self, journal: str, fingerprints: dict):
+        # Vale o último registro de cada arquivo, como no compact()
+        status = {}
+        for record in iter_records(journal):
+            status[record["entry"]["filename"]] = record
+
+        for filename, record in status.items():
+            if filename not in fingerprints:
+                continue
+            if record["status"] == "ok":
+                self.files[filename] = {
+                    "fingerprint": fingerprints[filename],
+                    "entry": record["entry"]
+                }
+            else:
+                self.files.pop(filename, None)
+
+        # Arquivos que saíram do corpus não voltam para a saída
+        self.files = {name: item for name, item in self.files.items() if name in fingerprints}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,114 @@
+import asyncio
+import math
+import os
+
+from prompt_packing import build_packed_prompt, pack_files
+from rate_limiter import DEFAULT_SAFETY, WINDOW, WINDOW_MARGIN, estimate_tokens
+from scheduling import predicted_makespan
+
+# Sem como prever a resposta: ~1 achado por label, cada um com uns 20 tokens
+# de JSON (sem contar os tokens de raciocínio dos modelos 2.5)
+OUTPUT_TOKENS_PER_LABEL = 20
+
+
+def build_plan(requester, files: list[str], labels_by_file: dict, pack_tokens=0) -> list[dict]:
+    """
+    Monta todos os prompts exatamente como a execução faria (pré-processamento,
+    janelas e pacotes incluídos), sem chamar a API. Devolve uma requisição
+    por item, na ordem de despacho, com os tokens estimados localmente e se
+    a resposta já está no cache.
+    """
+    if pack_tokens > 0:
+        packs = pack_files(files, labels_by_file, pack_tokens)
+    else:
+        packs = ([(index, file_path, labels_by_file.get(os.path.basename(file_path), []))]
+                 for index, file_path in enumerate(files, start=1))
+
+    extra = estimate_tokens(requester.system_instruction) if requester.system_instruction else 0
+    plan = []
+    for pack in packs:
+        if len(pack) > 1:
+            files_code = [(os.path.basename(file_path), requester.read_code(file_path)[0], labels2)
+                          for _, file_path, labels2 in pack]
+            prompts = [(build_packed_prompt(files_code), True)]
+            labels = sum(len(labels2) for _, _, labels2 in pack)
+        else:
+            _, file_path, labels2 = pack[0]
+            _, chunks = requester.prepare(file_path, labels2)
+            prompts = [(prompt, False) for _, prompt in chunks]
+            labels = len(labels2)
+
+        names = [os.path.basename(file_path) for _, file_path, _ in pack]
+        for prompt, packed in prompts:
+            plan.append({
+                "files": names,
+                "prompt": prompt,
+                "tokens": estimate_tokens(prompt) + extra,
+                "output_tokens": OUTPUT_TOKENS_PER_LABEL * labels * requester.vote,
+                "cached": requester.in_cache(prompt, packed=packed),
+            })
+    return plan
+
+
+async def count_tokens(client, model: str, plan: list[dict], concurrency: int,
+                       system_instruction=None):
+    """
+    Troca a estimativa local pela contagem do endpoint countTokens, que não
+    gasta cota de geração. O Gemini não aceita system_instruction no
+    countTokens; essa parte continua estimada.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    extra = estimate_tokens(system_instruction) if system_instruction else 0
+
+    async def count(item: dict):
+        async with semaphore:
+            response = await client.aio.models.count_tokens(model=model, contents=item["prompt"])
+            item["tokens"] = (response.total_tokens or 0) + extra
+
+    await asyncio.gather(*(count(item) for item in plan))
+
+
+def quota_time(requests: int, tokens: int, keys: int, rpm=None, tpm=None,
+               safety=DEFAULT_SAFETY) -> float:
+    """
+    Tempo mínimo em segundos imposto pela cota: a janela do RateLimiter
+    libera no máximo `capacity` por minuto e por chave, então cada cota
+    cheia a mais custa outro minuto de espera.
+    """
+    seconds = 0.0
+    for limit, amount in ((rpm, requests), (tpm, tokens)):
+        if limit and amount:
+            capacity = limit * safety * max(1, keys)
+            seconds = max(seconds, (math.ceil(amount / capacity) - 1) * (WINDOW + WINDOW_MARGIN))
+    return seconds
+
+
+def print_plan(plan: list[dict], latency_model, model: str, workers: int, keys: int,
+               rpm=None, tpm=None, batch=False, cascade=False, counted=False):
+    pending = [item for item in plan if not item["cached"]]
+    files = {name for item in plan for name in item["files"]}
+    input_tokens = sum(item["tokens"] for item in pending)
+    output_tokens = sum(item["output_tokens"] for item in pending)
+    source = "contados pelo countTokens" if counted else "estimados localmente"
+
+    print(f"\n📋 Plano: {len(plan)} requisições para {len(files)} arquivos com {model}")
+    print(f"💾 Cache: {len(plan) - len(pending)} acertos esperados, "
+          f"{len(pending)} requisições à API")
+    print(f"🔢 Tokens de entrada: ~{input_tokens} ({source}; "
+          f"{sum(item['tokens'] for item in plan)} com os do cache)")
+    print(f"🔢 Tokens de saída: ~{output_tokens} (estimativa grosseira pelos labels)")
+
+    if batch:
+        print("🗓️ Tempo: o job da Batch API não tem prazo previsível (até 24h)")
+        return
+
+    # Respostas em cache saem na hora; só as chamadas à API ocupam os workers
+    costs = [latency_model.predict(model, item["tokens"]) for item in pending]
+    makespan = predicted_makespan(costs, workers)
+    quota = quota_time(len(pending), input_tokens, keys, rpm, tpm)
+    bound = "cota" if quota > makespan else "latência"
+    print(f"🗓️ Tempo previsto: {max(makespan, quota):.1f}s (limitado pela {bound}; "
+          f"latência com {workers} workers {makespan:.1f}s, cota {quota:.1f}s)")
+    if cascade:
+        print("🪜 Cascata: só o primeiro modelo entra no plano; arquivos que subirem de "
+              "modelo custam chamadas a mais")
@@ -0,0 +1,110 @@
+import heapq
+import json
+import math
+import os
+
+from prompt_packing import file_tokens
+
+DEFAULT_HISTORY_PATH = ".gemini_latency.json"
+
+# Sem histórico suficiente: ~1s fixo + 1ms por token de entrada
+DEFAULT_BASE = 1.0
+DEFAULT_PER_TOKEN = 0.001
+MIN_SAMPLES = 5
+
+# Peso das execuções anteriores a cada nova execução, para a estimativa
+# acompanhar mudanças de latência da API sem esquecer tudo de uma vez
+HISTORY_DECAY = 0.5
+
+SUM_FIELDS = ("n", "x", "y", "xx", "xy")
+
+
+class LatencyModel:
+    """
+    Regressão linear latência = base + segundos por token de entrada, por
+    modelo. As somas da regressão ficam num JSON entre execuções.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.sums = {}
+        self.observed = 0
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for model, sums in json.load(f).items():
+                    self.sums[model] = {k: sums.get(k, 0.0) * HISTORY_DECAY for k in SUM_FIELDS}
+
+    def observe(self, model: str, tokens: int, latency: float):
+        sums = self.sums.setdefault(model, dict.fromkeys(SUM_FIELDS, 0.0))
+        sums["n"] += 1
+        sums["x"] += tokens
+        sums["y"] += latency
+        sums["xx"] += tokens * tokens
+        sums["xy"] += tokens * latency
+        self.observed += 1
+
+    def coefficients(self, model: str):
+        sums = self.sums.get(model)
+        if not sums or sums["n"] < MIN_SAMPLES:
+            return DEFAULT_BASE, DEFAULT_PER_TOKEN
+
+        n, x, y = sums["n"], sums["x"], sums["y"]
+        spread = n * sums["xx"] - x * x
+        if spread <= 1e-9 * n * sums["xx"]:
+            # Todos os arquivos do mesmo tamanho: só dá para estimar a média
+            return y / n, 0.0
+
+        per_token = max((n * sums["xy"] - x * y) / spread, 0.0)
+        return max((y - per_token * x) / n, 0.0), per_token
+
+    def predict(self, model: str, tokens: int) -> float:
+        base, per_token = self.coefficients(model)
+        return base + per_token * tokens
+
+    def save(self):
+        if not self.path or not self.observed:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.sums, f)
+        os.replace(tmp, self.path)
+
+
+def file_jobs(tokens: int, chunk_tokens: int) -> list[int]:
+    # Um arquivo grande vira uma requisição por janela
+    if not chunk_tokens or tokens <= chunk_tokens:
+        return [tokens]
+    return [chunk_tokens] * math.ceil(tokens / chunk_tokens)
+
+
+def schedule(files: list[str], labels_by_file: dict, latency: LatencyModel, model: str,
+             chunk_tokens=0, cached=()):
+    """
+    Ordena os arquivos do mais caro para o mais barato (longest processing
+    time first), com o custo previsto pelo tamanho e pelo histórico de
+    latência. Arquivos em `cached` já têm resposta no cache e não custam
+    nada. Devolve (arquivos ordenados, custos previstos de cada requisição
+    na ordem de despacho).
+    """
+    costs = {}
+    for file_path in files:
+        if file_path in cached:
+            costs[file_path] = []
+            continue
+        labels2 = labels_by_file.get(os.path.basename(file_path), [])
+        costs[file_path] = [latency.predict(model, tokens)
+                            for tokens in file_jobs(file_tokens(file_path, labels2), chunk_tokens)]
+
+    ordered = sorted(files, key=lambda file_path: sum(costs[file_path]), reverse=True)
+    return ordered, [cost for file_path in ordered for cost in costs[file_path]]
+
+
+def predicted_makespan(costs: list[float], workers: int) -> float:
+    # Simula os workers: cada requisição vai para o primeiro que ficar livre
+    if not costs:
+        return 0.0
+    finish = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
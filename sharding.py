@@ -0,0 +1,158 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from corpus import discover_files, load_labels
+
+DEFAULT_OUTPUT = "AiVulnAnalysis.json"
+DEFAULT_ERROR_OUTPUT = "erro_ia_log.json"
+
+SHARD_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+
+def parse_shard(value: str):
+    """
+    Lê "i/N" (1 <= i <= N) e devolve (i, N); usado como type= do argparse.
+    """
+    match = SHARD_RE.match(value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"shard inválido: {value!r} (use i/N, ex: 1/4)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard inválido: {value!r} (i deve estar entre 1 e N)")
+    return index, count
+
+
+def shard_of(filename: str, count: int) -> int:
+    # Hash do nome (não da ordem do os.walk nem do hash() do Python, que
+    # muda entre processos): a mesma partição em qualquer máquina
+    digest = hashlib.sha256(os.path.basename(filename).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(files: list[str], index: int, count: int) -> list[str]:
+    return [file for file in files if shard_of(file, count) == index]
+
+
+def shard_path(path: str, index: int, count: int) -> str:
+    # AiVulnAnalysis.json -> AiVulnAnalysis.shard-1-of-4.json
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+def _load(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def merge_shards(count: int, output=DEFAULT_OUTPUT, error_output=DEFAULT_ERROR_OUTPUT,
+                 expected=None) -> list[str]:
+    """
+    Junta as saídas (e os logs de erro) dos N shards em `output` e
+    `error_output`. Devolve a lista de problemas encontrados: saída de shard
+    ausente, arquivo repetido, arquivo no shard errado e, se `expected` for
+    dado (nomes na ordem de processamento), arquivos faltando ou sobrando.
+    """
+    problems = []
+    results = {}
+    errors = {}
+    seen = {}
+
+    for index in range(1, count + 1):
+        result_path = shard_path(output, index, count)
+        error_path = shard_path(error_output, index, count)
+
+        if not os.path.exists(result_path):
+            problems.append(f"saída do shard {index}/{count} não encontrada: {result_path}")
+            continue
+
+        entries = [("ok", entry) for entry in _load(result_path)]
+        if os.path.exists(error_path):
+            entries += [("error", entry) for entry in _load(error_path)]
+
+        for status, entry in entries:
+            filename = entry["filename"]
+            if status == "error" and filename in results and seen[filename] == index:
+                # Log de erro antigo: o log só é regravado quando há erros
+                continue
+            if filename in seen:
+                problems.append(f"{filename} aparece nos shards {seen[filename]} e {index}")
+                continue
+            seen[filename] = index
+            if shard_of(filename, count) != index:
+                problems.append(f"{filename} está no shard {index}, "
+                                f"mas pertence ao {shard_of(filename, count)}")
+            (results if status == "ok" else errors)[filename] = entry
+
+    if expected is not None:
+        expected_set = set(expected)
+        missing = [name for name in expected if name not in seen]
+        extra = sorted(name for name in seen if name not in expected_set)
+        if missing:
+            problems.append(f"{len(missing)} arquivos sem resultado nem erro: {', '.join(missing)}")
+        if extra:
+            problems.append(f"{len(extra)} arquivos fora do corpus: {', '.join(extra)}")
+
+    position = {name: i for i, name in enumerate(expected or [])}
+
+    def ordered(entries: dict) -> list:
+        # Na ordem do corpus quando conhecida; senão, shard a shard
+        return [entries[name] for name in sorted(
+            entries, key=lambda name: (position.get(name, len(position)), seen[name])
+        )]
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(ordered(results), f, indent=2, ensure_ascii=False)
+    if errors:
+        with open(error_output, "w", encoding="utf-8") as f:
+            json.dump(ordered(errors), f, indent=2, ensure_ascii=False)
+
+    print(f"🧩 {len(results)} resultados e {len(errors)} erros de {count} shards juntados em {output}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Junta as saídas de execuções do gemini_requester.py com --shard i/N."
+    )
+    parser.add_argument("-n", "--shards", type=int, required=True, help="Número de shards (N)")
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_OUTPUT,
+        help=f"Saída usada nos shards e destino da junção (default: {DEFAULT_OUTPUT})"
+    )
+    parser.add_argument(
+        "-e", "--error-output", default=DEFAULT_ERROR_OUTPUT,
+        help=f"Log de erros usado nos shards e destino da junção (default: {DEFAULT_ERROR_OUTPUT})"
+    )
+    parser.add_argument(
+        "-sc", "--source-code-dir",
+        help="Diretório dos arquivos analisados, para conferir se algum ficou de fora (requer -l)"
+    )
+    parser.add_argument("-l", "--list", help="JSON de labels do SAST usado nos shards")
+    args = parser.parse_args()
+
+    if args.shards < 1:
+        parser.error("--shards deve ser >= 1")
+    if bool(args.source_code_dir) != bool(args.list):
+        parser.error("-sc e -l devem ser usados juntos")
+
+    expected = None
+    if args.source_code_dir:
+        labels_by_file, _ = load_labels(args.list)
+        expected = list(dict.fromkeys(
+            os.path.basename(file) for file in discover_files(args.source_code_dir, labels_by_file)
+        ))
+
+    problems = merge_shards(args.shards, args.output, args.error_output, expected)
+    for problem in problems:
+        print(f"⚠️ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Todos os shards conferem.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Junta chamadas idênticas que estão em voo ao mesmo tempo: a primeira
+    executa e as demais esperam e recebem o mesmo resultado (ou a mesma
+    exceção). Nada fica guardado depois que a chamada termina; para isso
+    existe o cache de respostas.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.shared += 1
+            return await asyncio.shield(flight)
+
+        self.calls += 1
+        flight = asyncio.ensure_future(factory())
+        # Evita o aviso de exceção não lida se ninguém mais esperar o resultado
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.flights[key] = flight
+        flight.add_done_callback(lambda f: self.flights.pop(key, None))
+
+        # shield: se quem iniciou a chamada for cancelado, ela continua para
+        # os demais que estão esperando
+        return await asyncio.shield(flight)
@@ -0,0 +1,80 @@
+import json
+
+# Única coisa aceita antes do JSON, além de espaços em branco
+FENCE = "```json"
+
+
+class StreamingJsonParser:
+    """
+    Parser incremental para respostas em streaming. Recebe o texto em
+    pedaços e devolve cada objeto que termina diretamente dentro de uma
+    lista (ex: cada {"label", "line of Code"}), assim que ele chega.
+
+    Marca `invalid` quando o início da resposta claramente não é JSON.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.started = False
+        self.invalid = False
+        self.sniffed = ""
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.object_start = None
+
+    def feed(self, text: str) -> list:
+        found = []
+
+        for char in text:
+            if not self.started:
+                if not self._sniff(char):
+                    continue
+
+            self.buffer.append(char)
+            index = len(self.buffer) - 1
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in "[{":
+                if char == "{" and self.stack and self.stack[-1] == "[":
+                    self.object_start = (index, len(self.stack))
+                self.stack.append(char)
+            elif char in "]}":
+                if self.stack:
+                    self.stack.pop()
+                if (char == "}" and self.object_start is not None
+                        and self.object_start[1] == len(self.stack)):
+                    chunk = "".join(self.buffer[self.object_start[0]:])
+                    self.object_start = None
+                    try:
+                        found.append(json.loads(chunk))
+                    except json.JSONDecodeError:
+                        pass
+
+        return found
+
+    def _sniff(self, char: str) -> bool:
+        """
+        Pula espaços e a cerca markdown inicial; devolve True quando achar o
+        primeiro caractere do JSON.
+        """
+        if char in "[{":
+            self.started = True
+            return True
+
+        if not char.isspace():
+            self.sniffed += char
+            if not FENCE.startswith(self.sniffed):
+                self.invalid = True
+
+        return False
@@ -0,0 +1,147 @@
+import collections
+import csv
+import json
+import math
+import time
+
+METRIC_FIELDS = [
+    "timestamp", "filename", "model", "attempt", "status", "latency",
+    "prompt_tokens", "candidates_tokens", "cached_tokens", "total_tokens",
+    "finish_reason", "error"
+]
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Percentil por posto mais próximo (valores já ordenados)
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Telemetry:
+    """
+    Registra cada chamada à API (latência, tentativa, tokens do
+    usage_metadata e finish reason) num arquivo CSV ou JSONL, gravado linha a
+    linha, e mantém os agregados para o resumo e o snapshot do Prometheus.
+    """
+
+    def __init__(self, path=None, prometheus_path=None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.started = time.monotonic()
+        self.latencies = []
+        self.tokens = collections.Counter()
+        self.requests = collections.Counter()
+        self.buckets = collections.defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum = collections.Counter()
+
+        self.file = None
+        self.writer = None
+        if path:
+            self.file = open(path, "w", encoding="utf-8", newline="")
+            if path.endswith(".csv"):
+                self.writer = csv.DictWriter(self.file, fieldnames=METRIC_FIELDS)
+                self.writer.writeheader()
+
+    def record(self, filename, model, attempt, latency, usage=None, finish_reason=None,
+               error=None):
+        row = {
+            "timestamp": round(time.time(), 3),
+            "filename": filename,
+            "model": model,
+            "attempt": attempt,
+            "status": "ok" if error is None else "error",
+            "latency": round(latency, 4),
+            "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+            "candidates_tokens": getattr(usage, "candidates_token_count", None) or 0,
+            "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+            "total_tokens": getattr(usage, "total_token_count", None) or 0,
+            "finish_reason": finish_reason,
+            "error": error
+        }
+
+        self.requests[(model, row["status"])] += 1
+        for kind in ("prompt", "candidates", "cached", "total"):
+            self.tokens[(model, kind)] += row[f"{kind}_tokens"]
+
+        if error is None:
+            self.latencies.append(latency)
+            self.latency_sum[model] += latency
+            buckets = self.buckets[model]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+
+        if self.writer is not None:
+            self.writer.writerow(row)
+        elif self.file is not None:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def total(self, kind: str) -> int:
+        return sum(count for (_, k), count in self.tokens.items() if k == kind)
+
+    def write_prometheus(self, path: str):
+        lines = [
+            "# HELP gemini_requests_total Chamadas à API do Gemini por modelo e status.",
+            "# TYPE gemini_requests_total counter"
+        ]
+        for (model, status), count in sorted(self.requests.items()):
+            lines.append(f'gemini_requests_total{{model="{model}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP gemini_tokens_total Tokens consumidos por modelo e tipo.",
+            "# TYPE gemini_tokens_total counter"
+        ]
+        for (model, kind), count in sorted(self.tokens.items()):
+            lines.append(f'gemini_tokens_total{{model="{model}",type="{kind}"}} {count}')
+
+        lines += [
+            "# HELP gemini_request_latency_seconds Latência das chamadas bem-sucedidas.",
+            "# TYPE gemini_request_latency_seconds histogram"
+        ]
+        for model, buckets in sorted(self.buckets.items()):
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(
+                    f'gemini_request_latency_seconds_bucket{{model="{model}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'gemini_request_latency_seconds_bucket{{model="{model}",le="+Inf"}} {buckets[-1]}'
+            )
+            lines.append(
+                f'gemini_request_latency_seconds_sum{{model="{model}"}} {self.latency_sum[model]:.4f}'
+            )
+            lines.append(f'gemini_request_latency_seconds_count{{model="{model}"}} {buckets[-1]}')
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        calls = sum(self.requests.values())
+        failed = sum(count for (_, status), count in self.requests.items() if status == "error")
+        if not calls:
+            return
+
+        latencies = sorted(self.latencies)
+        prompt = self.total("prompt")
+        cached = self.total("cached")
+        candidates = self.total("candidates")
+        total = self.total("total")
+
+        print(f"📈 {calls} chamadas à API ({failed} com erro) em {elapsed:.1f}s")
+        if latencies:
+            print(f"📈 Latência p50 {percentile(latencies, 50):.2f}s | "
+                  f"p95 {percentile(latencies, 95):.2f}s | p99 {percentile(latencies, 99):.2f}s")
+        print(f"🧮 Tokens: {total} no total | entrada {prompt} "
+              f"({cached} em cache, {cached / prompt if prompt else 0:.0%}) | saída {candidates}")
+        print(f"🧮 Vazão: {total / elapsed if elapsed else 0:.0f} tokens/s "
+              f"({candidates / elapsed if elapsed else 0:.0f} tokens de saída/s)")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
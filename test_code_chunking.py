@@ -0,0 +1,92 @@
+from code_chunking import OVERLAP_LINES, chunk_code, merge_chunks
+from rate_limiter import CHARS_PER_TOKEN
+from response_parsing import LINE_KEY
+
+MAX_TOKENS = 400
+
+
+def make_source(functions=30) -> str:
+    parts = ["import os\n", "import subprocess\n", "\n"]
+    for n in range(functions):
+        parts.append(f"def handler_{n}(value):\n")
+        parts.append(f"    # Processa a entrada número {n}\n")
+        for step in range(6):
+            parts.append(f"    value = value + {step}  # passo {step}\n")
+        parts.append(f"    return os.system(value)  # MARK_{n}\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+SOURCE = make_source()
+LINES = SOURCE.splitlines(keepends=True)
+
+
+def marker_line(n: int) -> int:
+    return next(i for i, line in enumerate(LINES, start=1) if f"# MARK_{n}\n" in line)
+
+
+def window_lines(offset: int, text: str) -> range:
+    return range(offset + 1, offset + len(text.splitlines()) + 1)
+
+
+def test_small_code_is_a_single_window():
+    code = "import os\nos.system(cmd)\n"
+    assert chunk_code(code, MAX_TOKENS) == [(0, code)]
+
+
+def test_windows_fit_the_budget_and_match_the_original_lines():
+    windows = chunk_code(SOURCE, MAX_TOKENS)
+
+    assert len(SOURCE) > MAX_TOKENS * CHARS_PER_TOKEN
+    assert len(windows) > 1
+    for offset, text in windows:
+        assert len(text) <= MAX_TOKENS * CHARS_PER_TOKEN
+        assert text.splitlines(keepends=True) == LINES[offset:offset + len(text.splitlines())]
+
+
+def test_windows_cover_every_line_with_overlap():
+    windows = chunk_code(SOURCE, MAX_TOKENS)
+
+    covered = set()
+    for offset, text in windows:
+        covered.update(window_lines(offset, text))
+    assert covered == set(range(1, len(LINES) + 1))
+
+    for (offset, text), (next_offset, _) in zip(windows, windows[1:]):
+        end = offset + len(text.splitlines())
+        assert offset < next_offset <= end
+        assert end - next_offset <= OVERLAP_LINES
+
+
+def test_windows_start_at_a_function_boundary():
+    windows = chunk_code(SOURCE, MAX_TOKENS)
+
+    for offset, text in windows[1:]:
+        assert text.startswith("def ")
+
+
+def test_merge_applies_offsets_and_drops_duplicates_from_the_overlap():
+    windows = chunk_code(SOURCE, MAX_TOKENS)
+    marks = {marker_line(n): n for n in range(30)}
+
+    # Cada janela acha todos os marcadores que contém, com a linha relativa
+    parts = []
+    for offset, text in windows:
+        found = [{"label": "CWE-78", LINE_KEY: line - offset}
+                 for line in window_lines(offset, text) if line in marks]
+        parts.append((offset, found))
+
+    duplicated = sum(len(found) for _, found in parts) - len(marks)
+    assert duplicated > 0
+
+    merged = merge_chunks(parts)
+    assert sorted(item[LINE_KEY] for item in merged) == sorted(marks)
+
+
+def test_merge_keeps_different_labels_on_the_same_line():
+    merged = merge_chunks([
+        (0, [{"label": "CWE-78", LINE_KEY: 5}]),
+        (3, [{"label": "CWE-78", LINE_KEY: 2}, {"label": "CWE-89", LINE_KEY: 2}]),
+    ])
+
+    assert merged == [{"label": "CWE-78", LINE_KEY: 5}, {"label": "CWE-89", LINE_KEY: 5}]
@@ -0,0 +1,124 @@
+import ast
+
+from code_minify import KEEP_STRING_CHARS, MAX_STRING_CHARS, minify, remap_lines
+from response_parsing import LINE_KEY
+
+LONG_SQL = "SELECT * FROM users WHERE name = '%s' " * 10
+
+SOURCE = f'''"""Módulo de exemplo."""
+import os
+import sqlite3
+
+# Comentário de linha inteira
+
+
+def run(cmd):
+    """Executa um comando."""
+    # outro comentário
+    return os.system(cmd)  # MARK_SYSTEM
+
+
+def query(conn, name):
+    sql = (
+        "{LONG_SQL}"
+        "{LONG_SQL}"
+    )
+    return conn.execute(sql % name)  # MARK_EXECUTE
+
+
+def placeholder():
+    """Só a docstring."""
+
+
+def render(template):
+    """
+    Docstring de várias linhas
+    que some inteira.
+    """
+
+    return eval(template)  # MARK_EVAL
+'''
+
+
+def original_line(marker: str) -> int:
+    return next(i for i, line in enumerate(SOURCE.splitlines(), start=1) if marker in line)
+
+
+def minified_line(short: str, marker: str) -> int:
+    # Os comentários somem; procura pelo comando que vinha antes do marcador
+    statement = next(line for line in SOURCE.splitlines() if marker in line).split("#")[0].strip()
+    return next(i for i, line in enumerate(short.splitlines(), start=1) if line.strip() == statement)
+
+
+def test_minify_removes_comments_docstrings_and_blank_lines():
+    short, line_map = minify(SOURCE)
+
+    assert "#" not in short
+    assert "Executa um comando" not in short
+    assert "Docstring de várias linhas" not in short
+    assert all(line.strip() for line in short.splitlines())
+    assert len(line_map) == len(short.splitlines())
+    ast.parse(short)
+
+
+def test_minify_keeps_docstring_only_body_valid():
+    short, _ = minify(SOURCE)
+    lines = short.splitlines()
+
+    body = lines[lines.index("def placeholder():") + 1]
+    assert body.strip() == "..."
+
+
+def test_minify_shortens_long_strings():
+    short, _ = minify(SOURCE)
+
+    assert LONG_SQL not in short
+    for line in short.splitlines():
+        if "SELECT" in line:
+            assert len(line.strip()) <= KEEP_STRING_CHARS + 10
+    assert len(LONG_SQL) > MAX_STRING_CHARS
+
+
+def test_remap_round_trips_predictions_to_original_lines():
+    short, line_map = minify(SOURCE)
+    markers = ["MARK_SYSTEM", "MARK_EXECUTE", "MARK_EVAL"]
+
+    predictions = [{"label": "CWE-78", LINE_KEY: minified_line(short, marker)} for marker in markers]
+    remapped = remap_lines(predictions, line_map)
+
+    assert [p[LINE_KEY] for p in remapped] == [original_line(marker) for marker in markers]
+
+
+def test_line_map_points_at_the_same_code():
+    short, line_map = minify(SOURCE)
+    original = SOURCE.splitlines()
+
+    for text, row in zip(short.splitlines(), line_map):
+        # Linhas sem edição são idênticas à original (sem o comentário do fim)
+        if "..." not in text and "'" not in text:
+            assert original[row - 1].split("  #")[0].rstrip() == text
+
+
+def test_line_after_multiline_string_keeps_its_number():
+    short, line_map = minify(SOURCE)
+    lines = short.splitlines()
+
+    # Os parênteses do SQL de várias linhas viram menos linhas, mas o
+    # comando seguinte continua apontando para a linha original
+    index = next(i for i, line in enumerate(lines) if "conn.execute" in line)
+    assert line_map[index] == original_line("MARK_EXECUTE")
+
+
+def test_remap_keeps_lines_outside_the_minified_code():
+    _, line_map = minify(SOURCE)
+    predictions = [{"label": "CWE-78", LINE_KEY: 0}, {"label": "CWE-78", LINE_KEY: len(line_map) + 5}]
+
+    assert remap_lines(predictions, line_map) == predictions
+
+
+def test_code_that_does_not_parse_is_returned_unchanged():
+    code = "def broken(:\n    pass\n"
+    short, line_map = minify(code)
+
+    assert short == code
+    assert line_map == [1, 2]
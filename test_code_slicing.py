@@ -0,0 +1,91 @@
+import os
+
+import code_slicing
+from code_slicing import SLICE_HEADER, slice_code
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vulnerable_files", "files")
+
+with open(os.path.join(CORPUS, "inter_command_injection.py"), "r", encoding="utf-8") as f:
+    SOURCE = f.read()
+LINES = SOURCE.splitlines()
+
+
+def line_of(text: str) -> int:
+    return next(i for i, line in enumerate(LINES, start=1) if text in line)
+
+
+def numbered(sliced: str) -> dict:
+    # Linha original -> texto, sem o cabeçalho e as marcas de corte
+    rows = {}
+    for line in sliced.splitlines()[1:]:
+        if line == "...":
+            continue
+        number, text = line.split(": ", 1)
+        rows[int(number)] = text
+    return rows
+
+
+def test_flagged_sink_pulls_in_its_callers():
+    sliced = slice_code(SOURCE, {line_of("subprocess.call(arg, shell=True)")})
+    rows = numbered(sliced)
+
+    # shell_the_arg só é perigosa porque menu() passa a entrada do usuário
+    assert line_of("def shell_the_arg") in rows
+    assert line_of("def menu") in rows
+    assert line_of("request.form['suggestion']") in rows
+    assert line_of("def index") not in rows
+    assert line_of("def clean") not in rows
+
+
+def test_flagged_caller_pulls_in_its_callees():
+    rows = numbered(slice_code(SOURCE, {line_of("shell_the_arg('echo '")}))
+
+    assert line_of("subprocess.call(arg, shell=True)") in rows
+    assert line_of("def clean") not in rows
+
+
+def test_slice_keeps_the_imports_and_globals_it_uses():
+    rows = numbered(slice_code(SOURCE, {line_of("subprocess.call(arg, shell=True)")}))
+
+    assert line_of("import subprocess") in rows
+    assert line_of("from flask import") in rows
+    assert line_of("app = Flask(__name__)") in rows
+    assert line_of("app.run(debug=True)") not in rows
+
+
+def test_flagged_import_seeds_the_functions_that_use_it():
+    rows = numbered(slice_code(SOURCE, {line_of("import subprocess")}))
+
+    assert line_of("def shell_the_arg") in rows
+    assert line_of("def clean") in rows
+    # Chamadora de shell_the_arg, que usa o subprocess
+    assert line_of("def menu") in rows
+    assert line_of("def index") not in rows
+
+
+def test_prefixes_match_the_original_line_numbers():
+    sliced = slice_code(SOURCE, {line_of("subprocess.call(arg, shell=True)")})
+
+    assert sliced.splitlines()[0] == SLICE_HEADER
+    for number, text in numbered(sliced).items():
+        assert LINES[number - 1] == text
+
+
+def test_slice_that_keeps_most_of_the_file_is_not_worth_it(monkeypatch):
+    code = "import os\ndef run(cmd):\n    return os.system(cmd)\n"
+
+    assert slice_code(code, {3}) is None
+    monkeypatch.setattr(code_slicing, "MAX_SLICE_RATIO", 1.0)
+    assert slice_code(code, {3}) is not None
+
+
+def test_no_flagged_lines_or_only_blank_ones_return_none():
+    blank = line_of("app = Flask(__name__)") - 1
+
+    assert LINES[blank - 1] == ""
+    assert slice_code(SOURCE, set()) is None
+    assert slice_code(SOURCE, {blank}) is None
+
+
+def test_code_that_does_not_parse_returns_none():
+    assert slice_code("def broken(:\n    os.system(cmd)\n", {2}) is None
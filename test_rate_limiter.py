@@ -0,0 +1,144 @@
+import asyncio
+import random
+
+import pytest
+
+import rate_limiter
+from rate_limiter import WINDOW, WINDOW_MARGIN, RateLimiter, SlidingWindow
+
+EXPIRY = WINDOW + WINDOW_MARGIN
+
+
+class Clock:
+    # Relógio controlado: asyncio.sleep só avança o tempo
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake.sleep)
+    return fake
+
+
+def admit(window: SlidingWindow, amounts: list[float], gaps: list[float]) -> list[tuple]:
+    # Libera cada pedido assim que a janela deixa, como o acquire() faz
+    now = 0.0
+    admitted = []
+    for amount, gap in zip(amounts, gaps):
+        now += gap
+        wait = window.wait_time(amount, now)
+        while wait > 0:
+            now += wait
+            wait = window.wait_time(amount, now)
+        window.consume(amount, now)
+        admitted.append((now, min(amount, window.capacity)))
+    return admitted
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_no_window_ever_holds_more_than_the_capacity(seed):
+    rng = random.Random(seed)
+    window = SlidingWindow(1000)
+    amounts = [rng.choice([1, 50, 200, 900, 5000]) for _ in range(300)]
+    gaps = [rng.choice([0.0, 0.0, 0.5, 3.0, 20.0]) for _ in range(300)]
+
+    admitted = admit(window, amounts, gaps)
+
+    for start, _ in admitted:
+        in_window = sum(amount for at, amount in admitted if start <= at < start + WINDOW)
+        assert in_window <= window.capacity + 1e-9
+
+
+def test_wait_time_is_until_enough_of_the_window_expires():
+    window = SlidingWindow(10, safety=1.0)
+    for second in range(10):
+        window.consume(1, second)
+
+    assert window.wait_time(1, 10) == pytest.approx(EXPIRY - 10)
+    # Para 3 vagas precisam sair os três consumos mais antigos
+    assert window.wait_time(3, 10) == pytest.approx(2 + EXPIRY - 10)
+    assert window.wait_time(1, EXPIRY) == 0.0
+
+
+def test_request_larger_than_the_capacity_is_capped():
+    window = SlidingWindow(100, safety=1.0)
+
+    assert window.wait_time(500, 0) == 0.0
+    window.consume(500, 0)
+    assert window.used == 100
+    assert window.wait_time(1, 1) == pytest.approx(EXPIRY - 1)
+
+
+def test_adjust_corrects_the_last_consumption():
+    window = SlidingWindow(1000, safety=1.0)
+    window.consume(100, 0)
+    window.consume(100, 1)
+
+    window.adjust(50, 2)
+    assert window.used == 250
+    assert window.events[-1][1] == 150
+
+    # Nunca deixa um consumo negativo
+    window.adjust(-500, 3)
+    assert window.used == 100
+    assert window.events[-1][1] == 0
+
+    # A correção sai da janela junto com o consumo que ela corrigiu
+    window.consume(100, 4)
+    window.adjust(300, 4)
+    assert window.wait_time(700, 5) == pytest.approx(EXPIRY - 1)
+
+
+def test_settle_charges_the_real_token_count(clock):
+    limiter = RateLimiter(tpm=1000, safety=1.0)
+
+    async def run():
+        await limiter.acquire(400)
+        await limiter.acquire(400)
+        # A API contou 700 tokens no segundo pedido: a janela fica com 1100
+        limiter.settle(400, 700)
+        assert limiter.tokens.used == 1100
+        await limiter.acquire(100)
+
+    asyncio.run(run())
+    # Só cabe quando o primeiro consumo sai da janela
+    assert clock.now == pytest.approx(EXPIRY)
+    assert limiter.total_wait == pytest.approx(EXPIRY)
+
+
+def test_settle_without_usage_keeps_the_estimate(clock):
+    limiter = RateLimiter(tpm=1000, safety=1.0)
+    asyncio.run(limiter.acquire(400))
+
+    limiter.settle(400, None)
+    assert limiter.tokens.used == 400
+
+
+def test_headroom_is_the_tightest_of_rpm_and_tpm(clock):
+    limiter = RateLimiter(rpm=10, tpm=1000, safety=1.0)
+
+    assert limiter.headroom(100) == pytest.approx(0.9)
+    asyncio.run(limiter.acquire(500))
+    assert limiter.headroom(100) == pytest.approx(0.4)
+    assert limiter.headroom(5000) == pytest.approx(-0.5)
+
+    clock.now = EXPIRY
+    assert limiter.headroom(100) == pytest.approx(0.9)
+
+
+def test_no_limits_means_full_headroom_and_no_wait(clock):
+    limiter = RateLimiter()
+
+    asyncio.run(limiter.acquire(10 ** 6))
+    assert not limiter.enabled
+    assert limiter.headroom(10 ** 6) == 1.0
+    assert clock.now == 0.0